@@ -1,74 +1,2010 @@
+import time
+# 启动耗时统计的起点，尽量靠前以包含导入 PyQt5 的时间
+STARTUP_BEGIN = time.perf_counter()
 import sys
 import os
-import requests
+import argparse
+import json
 import collections
 import base64
+import hashlib
+import shutil
+import socket
+import sqlite3
+import threading
+import queue
+import math
+import random
+import functools
+import itertools
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QFileDialog, QDialog, QSpinBox, QLineEdit,
     QFormLayout, QDialogButtonBox, QComboBox, QAction, QMessageBox,
-    QStyle
+    QStyle, QCheckBox, QTableWidget, QTableWidgetItem, QHeaderView, QPlainTextEdit, QListView
 )
-from PyQt5.QtGui import QPixmap, QImage, QMovie, QPalette, QColor
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QSettings, QSize, QStandardPaths, QBuffer, QByteArray
+from PyQt5.QtGui import QPixmap, QImage, QImageReader, QMovie, QPalette, QColor
+from PyQt5.QtCore import Qt, QObject, QThreadPool, QRunnable, QTimer, pyqtSignal, QSettings, QSize, QStandardPaths, QBuffer, QByteArray, qInstallMessageHandler, QAbstractListModel, QModelIndex
 
 # --- 常量定义 ---
-KEYBOARD_SHORTCUTS_TIP = "快捷键: A, Space/D, Ctrl+S, Ctrl+,"
+KEYBOARD_SHORTCUTS_TIP = "快捷键: A, Space/D, F5, Ctrl+S, Ctrl+,"
+# 保存设置用的组织名和应用名，基准测试会换成别的应用名，以免改动真实设置
+SETTINGS_ORGANIZATION = "MyCompany"
+SETTINGS_APPLICATION = "acyViewer"
 
 # --- 默认设置 ---
 DEFAULT_API_URL = "https://www.acy.moe/api/r18"
 DEFAULT_MAX_CACHE_SIZE = 5
+DEFAULT_MIN_CACHE_SIZE = 2
+PREFETCH_EMPTY_PROBABILITY = 0.05
 DEFAULT_THEME = "深色"
+DEFAULT_STORE_SIZE_MB = 1024
+DEFAULT_MEMORY_BUDGET_MB = 256
+DECODED_NEIGHBOURS = 2
+SCALED_CACHE_SIZE = 16
+# 缩放结果缓存最多占内存缓存上限的比例
+SCALED_CACHE_BUDGET_SHARE = 0.25
+RESIZE_DEBOUNCE_MS = 150
+PROGRESSIVE_INTERVAL_MS = 150
+PROGRESSIVE_FORMATS = [".jpg"]
+DUPLICATE_HAMMING_DISTANCE = 4
+DEFAULT_SLIDESHOW_INTERVAL = 5
+# 幻灯片预取按 (获取 + 解码耗时) x 该系数 提前量规划，留出波动的余地
+SLIDESHOW_LEAD_MARGIN = 1.5
+# 获取队列和解码线程池的优先级：幻灯片马上要用的排在普通预取前面
+FETCH_PRIORITY_URGENT = 0
+FETCH_PRIORITY_PREFETCH = 1
+DECODE_PRIORITY_CURRENT = 2
+DECODE_PRIORITY_UPCOMING = 1
+DECODE_PRIORITY_NORMAL = 0
+# 错误类别 -> (首次重试前等待的秒数, 最长等待秒数)
+RETRY_POLICIES = {
+    "timeout": (1.0, 30.0),
+    "connection": (1.0, 60.0),
+    "server": (2.0, 60.0),
+    "throttled": (5.0, 300.0),
+    "client": (10.0, 300.0),
+    "other": (1.0, 30.0),
+    # 源正常，但连续返回看过的图片
+    "duplicate": (2.0, 300.0),
+}
+# 连续跳过这么多张重复图片之后才开始退避，偶尔的重复不影响预取
+DUPLICATE_BACKOFF_AFTER = 3
+HEADLESS_MAX_FAILURES = 20
+BREAKER_FAILURE_THRESHOLD = 4
+BREAKER_COOLDOWN = 10.0
+BREAKER_MAX_COOLDOWN = 120.0
+SOURCE_WINDOW = 50
+SOURCE_MIN_SAMPLES = 10
+SOURCE_MAX_ERROR_RATE = 0.5
+SOURCE_UNHEALTHY_SHARE = 0.05
+HEDGE_CHECK_MS = 100
+# 大图片按字节范围分段并行下载：不小于该大小、服务器支持 Range 时才分段
+RANGED_DOWNLOAD_MIN_BYTES = 2 * 1024 * 1024
+RANGED_DOWNLOAD_PARTS = 4
+RANGED_PART_MIN_BYTES = 512 * 1024
+METRICS_WINDOW = 2000
+PERF_PHASES = ["connect", "redirect", "ttfb", "transfer", "decode", "scale", "total"]
+HISTORY_MAX_LEN = 1000
+# 历史最多占磁盘缓存上限的比例，其余留给预取缓存和可淘汰的图片
+HISTORY_STORE_SHARE = 0.5
+THUMBNAIL_SIZE = 96
+THUMBNAIL_MEMORY_ITEMS = 400
+SAVE_BATCH_FILES = 32
+SAVE_BATCH_SECONDS = 0.2
+DEFAULT_FETCH_WORKERS = 4
+DEFAULT_DECODE_WORKERS = 2
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+# --- 磁盘图片存储 ---
+# 以内容的 sha256 作为键保存图片原始数据，索引存放在 SQLite 中。
+# 预取但未查看的图片与浏览历史也记录在索引里，重启后可直接恢复。
+class ImageStore:
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(root, "objects")
+        self.thumbnails_dir = os.path.join(root, "thumbnails")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(root, "index.sqlite3"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS lists (
+                kind TEXT NOT NULL, position INTEGER NOT NULL, digest TEXT NOT NULL, url TEXT,
+                PRIMARY KEY (kind, position)
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE INDEX IF NOT EXISTS blobs_lru ON blobs (last_access);
+        """)
+        self.db.commit()
+
+    @staticmethod
+    def digest_of(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def thumbnail_path(self, digest):
+        return os.path.join(self.thumbnails_dir, digest[:2], digest + ".jpg")
+
+    def has(self, digest):
+        with self._lock:
+            row = self.db.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return row is not None and os.path.exists(self.path(digest))
+
+    def put(self, data, digest=None):
+        digest = digest or self.digest_of(data)
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再改名，避免中途退出留下半个文件
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        with self._lock:
+            self.db.execute(
+                "INSERT INTO blobs (digest, size, last_access) VALUES (?, ?, ?) "
+                "ON CONFLICT(digest) DO UPDATE SET last_access = excluded.last_access",
+                (digest, len(data), time.time()))
+            self.db.commit()
+        self.evict()
+        return digest
+
+    def read(self, digest):
+        path = self.path(digest)
+        try:
+            # 调用方需要 bytes（哈希、QByteArray、写文件），直接整块读入；
+            # 用 mmap 再复制成 bytes 只会多一次拷贝
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if not data:
+            return None
+        with self._lock:
+            self.db.execute("UPDATE blobs SET last_access = ? WHERE digest = ?", (time.time(), digest))
+            self.db.commit()
+        return data
+
+    def sizes(self, digests):
+        with self._lock:
+            rows = self.db.execute(
+                f"SELECT digest, size FROM blobs WHERE digest IN ({','.join('?' * len(digests))})",
+                list(digests)).fetchall()
+        return dict(rows)
+
+    def read_head(self, digest, size=32):
+        # 识别格式只需要文件头，不读取整张图片
+        try:
+            with open(self.path(digest), 'rb') as f:
+                return f.read(size)
+        except OSError:
+            return b""
+
+    def export(self, digest, dest_path):
+        # 同一文件系统下直接硬链接，否则退化为文件复制
+        src = self.path(digest)
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(src, dest_path)
+        except OSError:
+            shutil.copyfile(src, dest_path)
+
+    def evict(self):
+        with self._lock:
+            total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # 历史与缓存列表仍在引用的图片不参与淘汰
+            rows = self.db.execute(
+                "SELECT digest, size FROM blobs WHERE digest NOT IN (SELECT digest FROM lists) "
+                "ORDER BY last_access").fetchall()
+            removed = []
+            for digest, size in rows:
+                if total <= self.max_bytes:
+                    break
+                for path in (self.path(digest), self.thumbnail_path(digest)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                removed.append((digest,))
+                total -= size
+            self.db.executemany("DELETE FROM blobs WHERE digest = ?", removed)
+            self.db.commit()
+
+    def save_list(self, kind, entries):
+        with self._lock:
+            self.db.execute("DELETE FROM lists WHERE kind = ?", (kind,))
+            self.db.executemany(
+                "INSERT INTO lists (kind, position, digest, url) VALUES (?, ?, ?, ?)",
+                [(kind, i, entry.digest, entry.url) for i, entry in enumerate(entries)])
+            self.db.commit()
+
+    def load_list(self, kind):
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT digest, url FROM lists WHERE kind = ? ORDER BY position", (kind,)).fetchall()
+        return [(digest, url) for digest, url in rows if os.path.exists(self.path(digest))]
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+            self.db.commit()
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+def default_store_dir():
+    return os.path.join(QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation), "acyViewer")
+
+
+# --- 重复图片索引 ---
+# 记录所有获取过的图片：内容 sha256 用于精确去重，dHash 用于近似去重。
+# dHash 按多索引哈希存放：64 位拆成 DUPLICATE_HAMMING_DISTANCE + 1 段，
+# 汉明距离不超过阈值的两个哈希至少有一段完全相同，只需比较同段桶里的候选。
+def dhash(data):
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QBuffer.ReadOnly)
+    reader = QImageReader(buffer)
+    # 直接按 9x8 解码，JPEG 可走 DCT 缩放，不会产生整图大小的内存
+    reader.setScaledSize(QSize(9, 8))
+    image = reader.read()
+    if image.isNull():
+        return None
+    image = image.convertToFormat(QImage.Format_Grayscale8)
+    value = 0
+    for y in range(8):
+        for x in range(8):
+            value = (value << 1) | int((image.pixel(x, y) & 0xff) > (image.pixel(x + 1, y) & 0xff))
+    return value
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class DuplicateIndex:
+    def __init__(self, path, max_distance=DUPLICATE_HAMMING_DISTANCE):
+        self.max_distance = max_distance
+        segments = max_distance + 1
+        self._segments = [(64 * i // segments, 64 * (i + 1) // segments) for i in range(segments)]
+        self._tables = [{} for _ in self._segments]
+        self._digests = set()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._closed = False
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS seen (digest TEXT PRIMARY KEY, dhash INTEGER)")
+        self.db.commit()
+        # 十万级记录载入需要一点时间，放到后台线程，查询时再等待
+        threading.Thread(target=self._load, daemon=True).start()
+
+    def _load(self):
+        # 载入失败（文件损坏、被锁定等）时按空索引继续，不能让等待的获取线程和退出一直卡住
+        try:
+            with self._lock:
+                for digest, value in self.db.execute("SELECT digest, dhash FROM seen"):
+                    if self._closed:
+                        break
+                    self._digests.add(digest)
+                    if value is not None:
+                        self._add_hash(value & 0xFFFFFFFFFFFFFFFF)
+        except sqlite3.Error as e:
+            sys.stderr.write(f"无法载入去重记录: {e}\n")
+        finally:
+            self._ready.set()
+
+    def _keys(self, value):
+        return [(value >> start) & ((1 << (end - start)) - 1) for start, end in self._segments]
+
+    def _add_hash(self, value):
+        for table, key in zip(self._tables, self._keys(value)):
+            table.setdefault(key, []).append(value)
+
+    def find_similar(self, value):
+        for table, key in zip(self._tables, self._keys(value)):
+            for candidate in table.get(key, ()):
+                if hamming_distance(candidate, value) <= self.max_distance:
+                    return candidate
+        return None
+
+    def __len__(self):
+        return len(self._digests)
+
+    def check_and_add(self, digest, data):
+        # 返回 "exact" / "similar" 表示重复；否则记录下来并返回 None
+        self._ready.wait()
+        with self._lock:
+            if digest in self._digests:
+                return "exact"
+        value = dhash(data)
+        with self._lock:
+            if digest in self._digests:
+                return "exact"
+            if value is not None and self.find_similar(value) is not None:
+                return "similar"
+            self._digests.add(digest)
+            if value is not None:
+                self._add_hash(value)
+            # SQLite 的 INTEGER 是有符号 64 位
+            stored = value - (1 << 64) if value is not None and value >= (1 << 63) else value
+            self.db.execute("INSERT OR IGNORE INTO seen (digest, dhash) VALUES (?, ?)", (digest, stored))
+            self.db.commit()
+        return None
+
+    def close(self):
+        # 后台载入尚未完成时让它提前结束，不拖慢退出
+        self._closed = True
+        self._ready.wait()
+        with self._lock:
+            self.db.close()
+
+
+# --- 自适应预取 ---
+# 根据翻页间隔、获取耗时和带宽估算预取深度：把一次补货期间的翻页次数
+# 视为泊松分布，取使缓存被翻空的概率不超过 empty_probability 的最小深度。
+# 幻灯片放映时翻页时间是确定的，改为按截止时间规划：获取加解码所需的提前量内
+# 会显示几张图片，就保证有几张已经在缓存中或正在获取。
+# 不依赖 Qt，时间来源可以注入，便于单独测试。
+class PrefetchController:
+    def __init__(self, min_depth, max_depth, empty_probability=PREFETCH_EMPTY_PROBABILITY,
+                 smoothing=0.3, clock=time.monotonic):
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.empty_probability = empty_probability
+        self.smoothing = smoothing
+        self.clock = clock
+        self.nav_interval = None
+        self.fetch_latency = None
+        self.decode_latency = None
+        self.bandwidth = None
+        self.image_bytes = None
+        self.last_navigation = None
+        # 幻灯片放映的间隔（秒），None 表示未放映
+        self.slideshow_interval = None
+
+    def _smooth(self, old, new):
+        return new if old is None else old + self.smoothing * (new - old)
+
+    def record_navigation(self):
+        now = self.clock()
+        if self.last_navigation is not None:
+            self.nav_interval = self._smooth(self.nav_interval, max(now - self.last_navigation, 0.01))
+        self.last_navigation = now
+
+    def record_fetch(self, latency, nbytes, decode_time=0.0):
+        latency = max(latency, 0.001)
+        self.fetch_latency = self._smooth(self.fetch_latency, latency)
+        if nbytes:
+            self.bandwidth = self._smooth(self.bandwidth, nbytes / latency)
+            self.image_bytes = self._smooth(self.image_bytes, nbytes)
+        if decode_time:
+            self.decode_latency = self._smooth(self.decode_latency, decode_time)
+
+    def slideshow_depth(self):
+        # 在一张新图片从请求到解码完成的时间内，幻灯片会用掉几张图片，再加上正在显示的下一张
+        if self.slideshow_interval is None:
+            return 0
+        lead = ((self.fetch_latency or 1.0) + (self.decode_latency or 0.0)) * SLIDESHOW_LEAD_MARGIN
+        return math.ceil(lead / self.slideshow_interval) + 1
+
+    def navigation_rate(self):
+        if self.nav_interval is None:
+            return None
+        # 用户停下来之后，距上次翻页的时间也计入，逐步降低预取深度
+        interval = self.nav_interval
+        if self.last_navigation is not None:
+            interval = max(interval, self.clock() - self.last_navigation)
+        return 1.0 / interval
+
+    def target_depth(self, workers=1):
+        if self.slideshow_interval is not None:
+            return min(max(self.slideshow_depth(), self.min_depth), self.max_depth)
+        rate = self.navigation_rate()
+        if rate is None or self.fetch_latency is None:
+            return min(max(DEFAULT_MAX_CACHE_SIZE, self.min_depth), self.max_depth)
+        # 并发数或带宽跟不上翻页速度时，再深的队列也会被翻空，直接取上限
+        throughput = workers / self.fetch_latency
+        if self.bandwidth and self.image_bytes:
+            throughput = min(throughput, self.bandwidth / self.image_bytes * workers)
+        if rate >= throughput:
+            return self.max_depth
+        expected = rate * self.fetch_latency
+        depth = 0
+        term = math.exp(-expected)
+        cumulative = term
+        while cumulative < 1.0 - self.empty_probability and depth < self.max_depth:
+            depth += 1
+            term *= expected / depth
+            cumulative += term
+        return min(max(depth + 1, self.min_depth), self.max_depth)
+
+
+# --- 重试与熔断 ---
+# 决定现在可以发出多少个获取请求。失败后按错误类别做带随机抖动的指数退避，
+# 429/503 的 Retry-After 优先；连续失败的轮数达到阈值后熔断，停止获取，
+# 冷却结束后只放行一个探测请求，成功则恢复，失败则加倍冷却时间。
+# 连续返回重复图片按单独的类别退避，不计入熔断，拿到新图片后清零。
+# 与 PrefetchController 一样不依赖 Qt，时间和随机数来源可以注入。
+class FetchScheduler:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, policies=RETRY_POLICIES, threshold=BREAKER_FAILURE_THRESHOLD,
+                 cooldown=BREAKER_COOLDOWN, max_cooldown=BREAKER_MAX_COOLDOWN,
+                 clock=time.monotonic, rng=random.random):
+        self.policies = policies
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self.rng = rng
+        self.reset()
+
+    def reset(self):
+        self.state = self.CLOSED
+        self.backoff_step = 0
+        self.last_failure = None
+        self.last_error = None
+        self.retry_at = 0.0
+        self.cooldown = self.base_cooldown
+        self.probe_in_flight = False
+        self.duplicate_run = 0
+
+    @staticmethod
+    def error_class(kind):
+        # kind 来自 fetch_error_kind
+        if kind == "http_429":
+            return "throttled"
+        if kind.startswith("http_5"):
+            return "server"
+        if kind.startswith("http_"):
+            return "client"
+        return kind if kind in ("timeout", "connection") else "other"
+
+    def wait_time(self):
+        return max(self.retry_at - self.clock(), 0.0)
+
+    def allowed(self, count):
+        if count <= 0 or self.wait_time() > 0:
+            return 0
+        if self.state == self.CLOSED:
+            return count
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+        if self.probe_in_flight:
+            return 0
+        self.probe_in_flight = True
+        return 1
+
+    def record_success(self):
+        self.reset()
+
+    def record_duplicate(self):
+        # 请求本身成功，失败的退避和熔断照常清零；但图片都看过了，看过整个图库之后不能不停地请求
+        run = self.duplicate_run + 1
+        self.reset()
+        self.duplicate_run = run
+        excess = self.duplicate_run - DUPLICATE_BACKOFF_AFTER
+        if excess <= 0:
+            return 0.0
+        base, limit = self.policies["duplicate"]
+        delay = min(base * 2 ** (excess - 1), limit)
+        delay = delay / 2 + self.rng() * delay / 2
+        self.retry_at = max(self.retry_at, self.clock() + delay)
+        return self.wait_time()
+
+    def record_failure(self, kind, started=None, retry_after=None):
+        # 返回距离下次允许获取的秒数
+        now = self.clock()
+        self.last_error = self.error_class(kind)
+        if self.state == self.HALF_OPEN:
+            # 探测失败，重新熔断并加倍冷却
+            self.probe_in_flight = False
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self._open(now, retry_after)
+            return self.wait_time()
+        if self.state == self.OPEN:
+            return self.wait_time()
+        # 并发的请求一起失败只算一轮，重试之后再失败才加倍退避并计入熔断阈值
+        if self.last_failure is None or started is None or started >= self.last_failure:
+            self.backoff_step += 1
+        self.last_failure = now
+        if self.backoff_step >= self.threshold:
+            self._open(now, retry_after)
+            return self.wait_time()
+        base, limit = self.policies.get(self.last_error, self.policies["other"])
+        delay = min(base * 2 ** (self.backoff_step - 1), limit)
+        # 在 [delay/2, delay] 之间抖动，避免所有客户端同时重试
+        delay = delay / 2 + self.rng() * delay / 2
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        self.retry_at = max(self.retry_at, now + delay)
+        return self.wait_time()
+
+    def _open(self, now, retry_after):
+        self.state = self.OPEN
+        delay = max(self.cooldown, retry_after or 0.0)
+        self.retry_at = now + delay
+
+
+# --- 多图片源选择 ---
+# 设置中每行一个图片源，格式为 "URL [权重]"。每个源记录最近的获取耗时和成败，
+# 并各自带一个 FetchScheduler 做退避与熔断。新任务按 权重 / 耗时中位数 的比例
+# 随机分给可用的源：快的源分到大部分请求，慢的源仍有少量请求以便发现它恢复；
+# 错误率过高的源只保留很小的探索比例。
+def parse_sources(text):
+    sources = []
+    for line in (text or "").splitlines():
+        parts = line.split()
+        if not parts or parts[0].startswith("#"):
+            continue
+        try:
+            weight = float(parts[1]) if len(parts) > 1 else 1.0
+        except ValueError:
+            weight = 1.0
+        if weight > 0:
+            sources.append((parts[0], weight))
+    return sources
+
+
+def format_sources(sources):
+    return "\n".join(url if weight == 1.0 else f"{url} {weight:g}" for url, weight in sources)
+
+
+class SourceStats:
+    def __init__(self, url, weight, clock=time.monotonic, rng=random.random):
+        self.url = url
+        self.weight = weight
+        self.latencies = collections.deque(maxlen=SOURCE_WINDOW)
+        self.outcomes = collections.deque(maxlen=SOURCE_WINDOW)
+        # 正在进行的请求中最久的已耗时，源突然变慢时不必等新样本进入窗口
+        self.stalled = 0.0
+        self.scheduler = FetchScheduler(clock=clock, rng=rng)
+
+    def record(self, latency, ok):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+
+    def error_rate(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def latency_percentile(self, p, min_samples=1):
+        if len(self.latencies) < max(min_samples, 1):
+            return None
+        values = sorted(self.latencies)
+        return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+    def expected_latency(self):
+        latency = self.latency_percentile(50)
+        return None if latency is None else max(latency, self.stalled)
+
+    def healthy(self):
+        return len(self.outcomes) < SOURCE_MIN_SAMPLES or self.error_rate() <= SOURCE_MAX_ERROR_RATE
+
+    def available(self):
+        # 退避中，或熔断后的探测请求还没有结果时，不再分配任务
+        scheduler = self.scheduler
+        if scheduler.wait_time() > 0:
+            return False
+        return scheduler.state == FetchScheduler.CLOSED or not scheduler.probe_in_flight
+
+
+class SourceSelector:
+    def __init__(self, sources, clock=time.monotonic, rng=random.random):
+        self.clock = clock
+        self.rng = rng
+        self.sources = []
+        self.set_sources(sources)
+
+    def set_sources(self, sources):
+        # 仍在列表中的源保留已有的统计
+        old = {source.url: source for source in self.sources}
+        self.sources = []
+        for url, weight in sources:
+            source = old.get(url) or SourceStats(url, weight, self.clock, self.rng)
+            source.weight = weight
+            self.sources.append(source)
+
+    def get(self, url):
+        for source in self.sources:
+            if source.url == url:
+                return source
+        return None
+
+    def choose(self, exclude=()):
+        candidates = [source for source in self.sources if source.url not in exclude and source.available()]
+        if not candidates:
+            return None
+        # 还没有数据的源按已知最快的耗时估计，保证它会被尝试
+        known = [source.expected_latency() for source in candidates if source.latencies]
+        fallback = min(known) if known else 1.0
+        scores = []
+        for source in candidates:
+            latency = source.expected_latency() or fallback
+            score = source.weight / max(latency, 0.001)
+            scores.append(score if source.healthy() else score * SOURCE_UNHEALTHY_SHARE)
+        pick = self.rng() * sum(scores)
+        for source, score in zip(candidates, scores):
+            pick -= score
+            if pick <= 0:
+                break
+        # 熔断后的探测请求需要在调度器中登记
+        source.scheduler.allowed(1)
+        return source
+
+    def wait_time(self):
+        # 所有源都不可用时，距离最早恢复的时间；只是在等探测结果时返回 None
+        waits = [source.scheduler.wait_time() for source in self.sources]
+        waits = [wait for wait in waits if wait > 0]
+        return min(waits) if waits else None
+
+    def state(self):
+        states = {source.scheduler.state for source in self.sources}
+        if not states or FetchScheduler.CLOSED in states:
+            return FetchScheduler.CLOSED
+        return FetchScheduler.HALF_OPEN if FetchScheduler.HALF_OPEN in states else FetchScheduler.OPEN
+
+    def reset(self):
+        for source in self.sources:
+            source.scheduler.reset()
+
+
+# --- 性能统计 ---
+# 每次获取按阶段记录耗时，各阶段保留最近 METRICS_WINDOW 个样本，
+# 打开“性能”对话框时再排序计算分位数，记录时只有几次 append 的开销。
+class PerformanceMetrics:
+    def __init__(self, window=METRICS_WINDOW):
+        self.enabled = True
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.samples = {phase: collections.deque(maxlen=self.window) for phase in PERF_PHASES}
+            self.records = collections.deque(maxlen=self.window)
+            self.cache_hits = 0
+            self.cache_misses = 0
+            # 幻灯片放映：到时间时下一张是否已解码就绪，未就绪的晚了多久才显示
+            self.deadlines = 0
+            self.deadlines_missed = 0
+            self.deadline_lateness = collections.deque(maxlen=self.window)
+
+    def record_phases(self, timings):
+        if not self.enabled:
+            return
+        with self._lock:
+            for phase, seconds in timings.items():
+                if phase in self.samples:
+                    self.samples[phase].append(seconds)
+
+    def record_fetch(self, timings, url, nbytes, total, duplicate=None):
+        timings = dict(timings, total=total)
+        record = {"time": round(time.time(), 3), "url": url, "bytes": nbytes}
+        record.update((f"{phase}_ms", round(seconds * 1000, 2)) for phase, seconds in timings.items())
+        if duplicate:
+            record["duplicate"] = duplicate
+        self.record_phases(timings)
+        with self._lock:
+            self.records.append(record)
+
+    def record_cache(self, hit):
+        if not self.enabled:
+            return
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
 
+    def record_deadline(self, missed):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.deadlines += 1
+            if missed:
+                self.deadlines_missed += 1
+
+    def record_lateness(self, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.deadline_lateness.append(seconds)
+
+    def hit_rate(self):
+        total = self.cache_hits + self.cache_misses
+        return self.cache_hits / total if total else None
+
+    def percentiles(self, phase, points=(50, 95, 99)):
+        with self._lock:
+            values = sorted(self.samples[phase])
+        if not values:
+            return len(values), [None for _ in points]
+        return len(values), [values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] for p in points]
+
+    def export_jsonl(self, path):
+        with self._lock:
+            records = list(self.records)
+        with open(path, 'w', encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return len(records)
+
+
+# --- 启动耗时统计 ---
+# --profile-startup 时逐阶段打印耗时，起点是模块开始导入的时间。
+class StartupProfiler:
+    def __init__(self, enabled=False, begin=STARTUP_BEGIN):
+        self.enabled = enabled
+        self.begin = begin
+        self.last = begin
+        self.marked = set()
+
+    def mark(self, phase, once=False):
+        if not self.enabled or (once and phase in self.marked):
+            return
+        self.marked.add(phase)
+        now = time.perf_counter()
+        print(f"[启动] {phase:<10} {(now - self.last) * 1000:8.1f} ms  累计 {(now - self.begin) * 1000:8.1f} ms", flush=True)
+        self.last = now
+
+
+# --- 图片条目 ---
+# 缓存与历史中的一项。原始数据按需从磁盘存储中加载，
+# pixmap 是已缩放到 pixmap_size 的显示用图片。
+# 内存分两级：当前图片附近的条目保留 pixmap，其余只保留压缩数据，
+# 超出内存预算时连压缩数据也释放，需要时再从磁盘读回并重新解码。
+class ImageEntry:
+    def __init__(self, digest, url, data=None, store=None):
+        self.digest = digest
+        self.url = url
+        self._data = data
+        self.store = store
+        # 原始数据的字节数，恢复的条目在需要时从存储索引中查询
+        self.size = len(data) if data is not None else None
+        self.pixmap = None
+        self.pixmap_size = None
+        self.decoding_size = None
+
+    @property
+    def data(self):
+        if self._data is None and self.store is not None:
+            self._data = self.store.read(self.digest)
+        return self._data
+
+    def pixmap_for(self, size):
+        if self.pixmap is not None and self.pixmap_size == size:
+            return self.pixmap
+        return None
+
+    def set_image(self, image, size):
+        # GUI 线程中只做最后一步 QImage -> QPixmap 的转换
+        self.set_pixmap(QPixmap.fromImage(image), size)
+
+    def set_pixmap(self, pixmap, size):
+        self.pixmap = pixmap
+        self.pixmap_size = QSize(size)
+
+    def release_pixmap(self):
+        self.pixmap = None
+        self.pixmap_size = None
+
+    def release_data(self):
+        # 只有磁盘存储里还有这张图时才能丢掉内存中的压缩数据
+        if self._data is not None and self.store is not None and self.store.has(self.digest):
+            self._data = None
+
+    def data_bytes(self):
+        return len(self._data) if self._data is not None else 0
+
+    def memory_bytes(self):
+        size = self.data_bytes()
+        if self.pixmap is not None:
+            size += pixmap_bytes(self.pixmap)
+        return size
+
+
+def pixmap_bytes(pixmap):
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+
+# --- 缩放结果缓存 ---
+# 按 (图片摘要, 目标尺寸) 保存平滑缩放后的 pixmap，
+# 最大化/还原窗口或回看历史时可以直接复用。按数量和字节数双重限制，
+# 占用的内存计入内存缓存上限，超出上限时最先被释放。
+class ScaledPixmapCache:
+    def __init__(self, capacity=SCALED_CACHE_SIZE, max_bytes=None):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.items = collections.OrderedDict()
+        self.bytes = 0
+
+    def get(self, digest, size):
+        key = (digest, size.width(), size.height())
+        pixmap = self.items.get(key)
+        if pixmap is not None:
+            self.items.move_to_end(key)
+        return pixmap
+
+    def put(self, digest, size, pixmap):
+        key = (digest, size.width(), size.height())
+        if key in self.items:
+            self._pop(key)
+        self.items[key] = pixmap
+        self.bytes += pixmap_bytes(pixmap)
+        while len(self.items) > self.capacity or (
+                self.max_bytes is not None and self.bytes > self.max_bytes and len(self.items) > 1):
+            self._pop(next(iter(self.items)))
+
+    def _pop(self, key):
+        pixmap = self.items.pop(key)
+        self.bytes -= pixmap_bytes(pixmap)
+        return pixmap
+
+    def discard(self, digest):
+        for key in [key for key in self.items if key[0] == digest]:
+            self._pop(key)
+
+    def unshared_bytes(self, held):
+        # held 为图片条目仍持有的 pixmap 的 cacheKey，这些 pixmap 已经算在条目里
+        return sum(pixmap_bytes(pixmap) for pixmap in self.items.values() if pixmap.cacheKey() not in held)
+
+    def shrink(self, held, excess):
+        # 从最旧的开始丢弃只有缓存自己持有的 pixmap，返回释放的字节数
+        freed = 0
+        for key in list(self.items):
+            if freed >= excess:
+                break
+            if self.items[key].cacheKey() not in held:
+                freed += pixmap_bytes(self._pop(key))
+        return freed
+
+    def clear(self):
+        self.items.clear()
+        self.bytes = 0
+
+
+def _image_reader(data):
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QBuffer.ReadOnly)
+    reader = QImageReader(buffer)
+    # QImageReader 不持有 buffer 的所有权
+    reader.buffer = buffer
+    return reader
+
+
+def decode_image(data, size=None, timings=None, pixel_ratio=1.0):
+    # 在工作线程中解码并缩放，size 为 None 时返回原始分辨率（复制到剪贴板时使用）。
+    # 缩小时直接按显示尺寸 x 设备像素比解码：JPEG 在 DCT 阶段就缩小，
+    # 8K 图片也不会先产生整图大小的 QImage。放大时仍然完整解码再平滑缩放
+    start = time.perf_counter()
+    reader = _image_reader(data)
+    full_size = reader.size()
+    target = None
+    if size is not None:
+        target = QSize(round(size.width() * pixel_ratio), round(size.height() * pixel_ratio))
+        if full_size.isValid():
+            target = full_size.scaled(target, Qt.KeepAspectRatio)
+            if target.width() < full_size.width():
+                reader.setScaledSize(target)
+    image = reader.read()
+    decoded = time.perf_counter()
+    if timings is not None:
+        timings["decode"] = decoded - start
+    if image.isNull() or target is None:
+        return image
+    if image.width() < target.width() or not full_size.isValid():
+        image = image.scaled(target, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        if timings is not None:
+            timings["scale"] = time.perf_counter() - decoded
+    image.setDevicePixelRatio(pixel_ratio)
+    return image
+
+
+def decode_partial(data, size, pixel_ratio=1.0):
+    # 解码尚未下载完的图片，缺失的部分由解码器补成灰色。
+    # 同样直接按目标尺寸解码，代价远小于完整解码再缩放
+    reader = _image_reader(data)
+    full_size = reader.size()
+    if full_size.isValid() and size.isValid():
+        target = QSize(round(size.width() * pixel_ratio), round(size.height() * pixel_ratio))
+        reader.setScaledSize(full_size.scaled(target, Qt.KeepAspectRatio))
+    image = reader.read()
+    image.setDevicePixelRatio(pixel_ratio)
+    return image
+
+
+def quiet_partial_decode_warnings(mode, context, message):
+    # 解码未下载完的 JPEG 时 libjpeg 总会报告数据提前结束，这是预期内的
+    if "premature end of data segment" in message:
+        return
+    sys.stderr.write(message + "\n")
+
+
+# --- 解码线程池 ---
+# 对历史、恢复的图片以及窗口尺寸变化后的重新缩放，在线程池中完成解码与缩放。
+class DecodeTask(QRunnable):
+    def __init__(self, decoder, entry, size, callback):
+        super().__init__()
+        self.decoder = decoder
+        self.entry = entry
+        self.size = size
+        self.callback = callback
+
+    def run(self):
+        data = self.entry.data
+        timings = {}
+        image = decode_image(data, self.size, timings, self.decoder.pixel_ratio) if data else QImage()
+        if self.decoder.metrics is not None and timings:
+            self.decoder.metrics.record_phases(timings)
+        self.decoder._decoded.emit(self.callback, image)
 
-# --- 图片获取线程 ---
-class ImageFetcher(QThread):
-    image_fetched = pyqtSignal(QPixmap, bytes, str)
-    fetch_error = pyqtSignal(str)
 
-    def __init__(self, api_url):
+class ImageDecoder(QObject):
+    _decoded = pyqtSignal(object, QImage)
+
+    def __init__(self, metrics=None, parent=None):
+        super().__init__(parent)
+        self.metrics = metrics
+        # 窗口所在屏幕的设备像素比，高分屏上按物理像素解码
+        self.pixel_ratio = 1.0
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(DEFAULT_DECODE_WORKERS)
+        self._decoded.connect(lambda callback, image: callback(image))
+
+    def submit(self, entry, size, callback, priority=DECODE_PRIORITY_NORMAL):
+        self.pool.start(DecodeTask(self, entry, QSize(size) if size is not None else None, callback), priority)
+
+    def shutdown(self, timeout=1500):
+        self.pool.clear()
+        self.pool.waitForDone(timeout)
+
+
+# --- 历史缩略图 ---
+# 胶片栏只为可见的历史条目请求缩略图。缩略图在独立的线程池中按显示尺寸解码，
+# 以 JPEG 保存在磁盘存储的 thumbnails 目录，内存中按最近使用保留 THUMBNAIL_MEMORY_ITEMS 张。
+# 后请求的先做：快速滚动时，已经滚出视野的请求排在后面。
+class ThumbnailTask(QRunnable):
+    def __init__(self, loader, digest, data):
         super().__init__()
-        self.api_url = api_url
-        self.session = requests.Session()
-        self.session.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'})
-        self._is_interruption_requested = False
+        self.loader = loader
+        self.digest = digest
+        self.data = data
 
     def run(self):
+        store = self.loader.store
+        path = store.thumbnail_path(self.digest)
+        image = QImage(path) if os.path.exists(path) else QImage()
+        if image.isNull():
+            # 只读取这一次，不把原始数据留在历史条目里
+            data = self.data if self.data is not None else store.read(self.digest)
+            image = decode_image(data, QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE)) if data else QImage()
+            if not image.isNull():
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                if image.save(tmp_path, "JPG", 85):
+                    os.replace(tmp_path, path)
+        self.loader._loaded.emit(self.digest, image)
+
+
+class ThumbnailLoader(QObject):
+    loaded = pyqtSignal(str)
+    _loaded = pyqtSignal(str, QImage)
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.pixmaps = collections.OrderedDict()
+        self.pending = set()
+        self.order = itertools.count()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(DEFAULT_DECODE_WORKERS)
+        self._loaded.connect(self._on_loaded)
+
+    def get(self, entry):
+        pixmap = self.pixmaps.get(entry.digest)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(entry.digest)
+            return pixmap
+        if entry.digest not in self.pending:
+            self.pending.add(entry.digest)
+            self.pool.start(ThumbnailTask(self, entry.digest, entry._data), next(self.order))
+        return None
+
+    def _on_loaded(self, digest, image):
+        self.pending.discard(digest)
+        if image.isNull():
+            return
+        self.pixmaps[digest] = QPixmap.fromImage(image)
+        while len(self.pixmaps) > THUMBNAIL_MEMORY_ITEMS:
+            self.pixmaps.popitem(last=False)
+        self.loaded.emit(digest)
+
+    def shutdown(self, timeout=1500):
+        self.pool.clear()
+        self.pool.waitForDone(timeout)
+
+
+class HistoryModel(QAbstractListModel):
+    def __init__(self, thumbnails, parent=None):
+        super().__init__(parent)
+        self.thumbnails = thumbnails
+        self.entries = []
+        self.rows = {}
+        self.placeholder = QPixmap(THUMBNAIL_SIZE, THUMBNAIL_SIZE * 3 // 4)
+        self.placeholder.fill(QColor(80, 80, 80))
+        thumbnails.loaded.connect(self.thumbnail_loaded)
+
+    def set_entries(self, entries):
+        # 历史变化时整体重置；视图使用统一的条目尺寸，重置只需要常数时间的布局
+        self.beginResetModel()
+        self.entries = list(entries)
+        self.rows = {}
+        for row, entry in enumerate(self.entries):
+            self.rows.setdefault(entry.digest, []).append(row)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.entries[index.row()]
+        if role == Qt.DecorationRole:
+            pixmap = self.thumbnails.get(entry)
+            return pixmap if pixmap is not None else self.placeholder
+        if role == Qt.ToolTipRole:
+            return f"{index.row() + 1}/{len(self.entries)} {entry.url or ''}"
+        return None
+
+    def thumbnail_loaded(self, digest):
+        for row in self.rows.get(digest, ()):
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+# --- 下载与格式识别 ---
+# 不依赖 Qt 的下载逻辑，图形界面的工作线程和无界面批量下载共用。
+# requests 在首次联网时才导入，不拖慢窗口的首次显示。
+IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp']
+
+
+# 每个线程记录自己建立连接（含 TLS 握手）的起止时间，用于拆分请求各阶段耗时；
+# 同时记下当前下载正在使用的连接，取消时可以从其他线程直接中断。
+# 连接归还连接池时从列表中移除：之后它可能已经属于其他线程的下载，不能再中断
+_connect_events = threading.local()
+_connections_lock = threading.Lock()
+
+
+def _record_connect(start):
+    events = getattr(_connect_events, "events", None)
+    if events is not None:
+        events.append((start, time.perf_counter() - start))
+
+
+def _track_connection(connection):
+    connections = getattr(_connect_events, "connections", None)
+    if connections is not None:
+        with _connections_lock:
+            connections.append(connection)
+            connection.tracked_in = connections
+
+
+def _untrack_connection(connection):
+    with _connections_lock:
+        connections = getattr(connection, "tracked_in", None)
+        if connections is not None:
+            if connection in connections:
+                connections.remove(connection)
+            connection.tracked_in = None
+
+
+def abort_connections(connections):
+    # 与归还连接池互斥：列表中的连接在中断时一定还属于这次下载
+    with _connections_lock:
+        for connection in connections:
+            abort_connection(connection)
+
+
+def abort_connection(connection):
+    # shutdown 会立即唤醒阻塞在 recv 上的线程，比等待超时快得多；
+    # 连接归还连接池后会被识别为已断开并丢弃
+    sock = getattr(connection, "sock", None)
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+@functools.lru_cache(maxsize=None)
+def timed_adapter_class():
+    import requests
+    import urllib3
+
+    class TimedHTTPConnection(urllib3.connection.HTTPConnection):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                super().connect()
+            finally:
+                _record_connect(start)
+
+        def request(self, *args, **kwargs):
+            _track_connection(self)
+            return super().request(*args, **kwargs)
+
+    class TimedHTTPSConnection(urllib3.connection.HTTPSConnection):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                super().connect()
+            finally:
+                _record_connect(start)
+
+        def request(self, *args, **kwargs):
+            _track_connection(self)
+            return super().request(*args, **kwargs)
+
+    class TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+        def _put_conn(self, conn):
+            if conn is not None:
+                _untrack_connection(conn)
+            super()._put_conn(conn)
+
+    class TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+        def _put_conn(self, conn):
+            if conn is not None:
+                _untrack_connection(conn)
+            super()._put_conn(conn)
+
+    class TimedHTTPAdapter(requests.adapters.HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+    return TimedHTTPAdapter
+
+
+def create_session(pool_size):
+    import requests
+    session = requests.Session()
+    session.headers.update({'User-Agent': USER_AGENT})
+    adapter = timed_adapter_class()(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _read_into(response, view, is_cancelled, on_chunk=None):
+    # 把响应正文直接读进预先分配的缓冲区，返回读到的字节数；被取消时返回 None。
+    # 绕过了 iter_content，urllib3 的异常按 requests 的方式转换，错误分类保持一致
+    import requests
+    import urllib3
+    # 需要报告进度时用小块读取，urllib3 要读满一块才返回，慢速网络下大块会推迟首次显示
+    block = 8192 if on_chunk is not None else 65536
+    received = 0
+    while received < len(view):
+        if is_cancelled():
+            return None
         try:
-            response = self.session.get(self.api_url, timeout=20, allow_redirects=True, stream=True)
+            count = response.raw.readinto(view[received:received + block])
+        except urllib3.exceptions.ReadTimeoutError as e:
+            raise requests.exceptions.ReadTimeout(e)
+        except urllib3.exceptions.ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+        except urllib3.exceptions.SSLError as e:
+            raise requests.exceptions.SSLError(e)
+        if not count:
+            break
+        received += count
+        if on_chunk is not None:
+            on_chunk(received)
+    return received
+
+
+def _fetch_range(session, image_url, start, view, timeout, is_cancelled, connections, errors):
+    # 分段下载的工作线程：请求 [start, start + len(view)) 这段字节并写入 view
+    import requests
+    _connect_events.events = None
+    _connect_events.connections = connections
+    end = start + len(view) - 1
+    try:
+        with session.get(image_url, headers={"Range": f"bytes={start}-{end}"}, timeout=timeout, stream=True) as response:
             response.raise_for_status()
-
-            if self._is_interruption_requested:
-                self.fetch_error.emit("下载被中断。")
+            # 服务器忽略 Range 时会返回整张图片，不能当作这一段
+            if response.status_code != 206 or not response.headers.get("Content-Range", "").startswith(f"bytes {start}-{end}/"):
+                raise requests.exceptions.InvalidHeader(f"服务器没有按范围返回数据: {start}-{end}")
+            received = _read_into(response, view, is_cancelled)
+            if received is not None and received < len(view):
+                raise requests.exceptions.ChunkedEncodingError(f"分段数据不完整: {received}/{len(view)}")
+    except Exception as e:
+        errors.append(e)
+
+
+def _range_parts(response, total):
+    # 支持 Range、大小已知且足够大的图片才分段，返回分段数，1 表示单连接下载
+    if not total or total < RANGED_DOWNLOAD_MIN_BYTES:
+        return 1
+    if response.headers.get("Accept-Ranges", "").lower() != "bytes":
+        return 1
+    if response.headers.get("Content-Encoding", "identity").lower() != "identity":
+        return 1
+    return max(1, min(RANGED_DOWNLOAD_PARTS, total // RANGED_PART_MIN_BYTES))
+
+
+def download_image(session, api_url, is_cancelled=lambda: False, timeout=20, timings=None, on_progress=None,
+                   connections=None):
+    # 返回 (图片数据, 重定向后的图片地址)，被取消时返回 None。
+    # 传入 on_progress 时每收到一块数据调用一次 on_progress(缓冲区, 从头开始连续收到的字节数, 总字节数或 None)。
+    # 传入 connections 列表时，下载正在使用的连接会记在里面，供其他线程调用 abort_connections 中断。
+    # 传入 timings 时按阶段记录耗时（秒）：redirect 为最终请求发出之前的全部时间，
+    # connect 为最终请求建立连接的时间，ttfb 为其余等待响应头的时间，transfer 为读取正文的时间。
+    # 大图片在响应头到达后按 Range 分段：本连接继续读第一段，其余各段在连接池的其他连接上并行下载，
+    # 全部直接写入同一个预先分配的缓冲区。任何一段失败时，本连接接着把剩下的部分读完。
+    import requests
+    if connections is None:
+        connections = []
+    _connect_events.events = [] if timings is not None else None
+    _connect_events.connections = connections
+    start = time.perf_counter()
+    response = session.get(api_url, timeout=timeout, allow_redirects=True, stream=True)
+    headers_received = time.perf_counter()
+    response.raise_for_status()
+
+    if is_cancelled():
+        response.close()
+        return None
+
+    image_url = response.url
+    total = int(response.headers.get("Content-Length") or 0) or None
+    report = None
+    if total is None or response.headers.get("Content-Encoding", "identity").lower() != "identity":
+        # 长度未知（或经过压缩）时只能边读边追加
+        buffer = bytearray()
+        for chunk in response.iter_content(chunk_size=8192):
+            if is_cancelled():
+                response.close()
+                return None
+            buffer += chunk
+            if on_progress is not None:
+                on_progress(buffer, len(buffer), total)
+        image_data = bytes(buffer)
+    else:
+        buffer = bytearray(total)
+        view = memoryview(buffer)
+        if on_progress is not None:
+            report = lambda received: on_progress(buffer, received, total)
+        parts = _range_parts(response, total)
+        part_size = -(-total // parts)
+        threads = []
+        errors = []
+        stop = threading.Event()
+        part_cancelled = lambda: stop.is_set() or is_cancelled()
+        for i in range(1, parts):
+            part_start = i * part_size
+            thread = threading.Thread(
+                target=_fetch_range, daemon=True,
+                args=(session, image_url, part_start, view[part_start:part_start + part_size], timeout,
+                      part_cancelled, connections, errors))
+            thread.start()
+            threads.append(thread)
+        received = None
+        try:
+            first = view[:part_size] if threads else view
+            received = _read_into(response, first, is_cancelled, report)
+        finally:
+            if received is None:
+                # 本连接出错或被取消：中断仍在下载的其余各段，不等它们超时；
+                # 重定向和已经完成的分段用过的连接已归还连接池，不在列表中
+                stop.set()
+                abort_connections(connections)
+            for thread in threads:
+                thread.join()
+        if received is None or is_cancelled():
+            response.close()
+            return None
+        if threads and errors:
+            # 某一段失败：退回单连接，从第一段末尾继续读完整个正文
+            more = _read_into(response, view[received:], is_cancelled)
+            if more is None:
+                response.close()
+                return None
+            received += more
+        elif threads and received == part_size:
+            # 第一段完整，其余各段也都成功
+            received = total
+        # 否则第一段就提前结束了（urllib3 1.x 连接中断时返回 0 而不是抛出异常），按不完整处理
+        # 第一段之后的正文不再需要，关闭连接而不是读完它
+        response.close()
+        if received < total:
+            raise requests.exceptions.ChunkedEncodingError(f"图片数据不完整: {received}/{total}")
+        image_data = bytes(buffer)
+    if timings is not None:
+        final_request_sent = headers_received - response.elapsed.total_seconds()
+        connect = sum(duration for started, duration in _connect_events.events if started >= final_request_sent)
+        timings["redirect"] = max(final_request_sent - start, 0.0)
+        timings["connect"] = connect
+        timings["ttfb"] = max(response.elapsed.total_seconds() - connect, 0.0)
+        timings["transfer"] = time.perf_counter() - headers_received
+        _connect_events.events = None
+    return image_data, image_url
+
+
+def fetch_error_message(error, api_url):
+    import requests
+    if isinstance(error, requests.exceptions.Timeout):
+        return f"网络请求超时: {api_url}"
+    if isinstance(error, requests.exceptions.RequestException):
+        return f"网络请求错误: {error}"
+    return f"获取图片时发生未知错误: {error}"
+
+
+def fetch_error_kind(error):
+    import requests
+    if isinstance(error, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return f"http_{error.response.status_code}"
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return "connection"
+    if isinstance(error, requests.exceptions.RequestException):
+        return "request"
+    return "other"
+
+
+def retry_after_seconds(error):
+    # Retry-After 可以是秒数，也可以是 HTTP 日期
+    response = getattr(error, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    import email.utils
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def sniff_image_extension(data):
+    # 只看文件头的魔数，不需要解码图片
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return ".gif"
+    if data.startswith(b"BM"):
+        return ".bmp"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def image_filename(image_url, image_data):
+    filename_base = os.path.basename(image_url.split('?')[0]) if image_url else ""
+    filename, ext = os.path.splitext(filename_base)
+    if not ext or ext.lower() not in IMAGE_EXTENSIONS:
+        ext = sniff_image_extension(image_data) or ".jpg"
+    return (filename if filename else "image") + ext
+
+
+# --- 后台保存 ---
+# 保存和导出都不在界面线程中写文件。写入线程先把图片写到（或从磁盘存储硬链接到）临时文件，
+# 攒够 SAVE_BATCH_FILES 个或等待 SAVE_BATCH_SECONDS 后统一 fsync、改名，每个目录只 fsync 一次。
+# 批量导出另起线程扫描目标目录，只对和待导出图片大小相同的文件计算哈希，内容已存在的直接跳过。
+class SaveJob:
+    def __init__(self, digest, dest_path, data=None, export=None):
+        self.digest = digest
+        self.dest_path = dest_path
+        # 图片不在磁盘存储中时才需要内存中的数据
+        self.data = data
+        self.export = export
+        self.tmp_path = None
+
+
+class ExportJob:
+    def __init__(self, entries, out_dir):
+        # [(digest, url, data)]
+        self.entries = entries
+        self.out_dir = out_dir
+        self.total = len(entries)
+        self.written = 0
+        self.skipped = 0
+        self.failed = 0
+        self.cancelled = False
+
+    @property
+    def done(self):
+        return self.written + self.skipped + self.failed
+
+
+class SaveQueue(QObject):
+    saved = pyqtSignal(str)
+    save_failed = pyqtSignal(str, str)
+    export_progress = pyqtSignal(object)
+    export_finished = pyqtSignal(object)
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.jobs = queue.Queue()
+        self.exports = []
+        self._tmp_order = itertools.count()
+        self.writer = None
+
+    def _ensure_writer(self):
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._write_loop, daemon=True)
+            self.writer.start()
+
+    def save(self, digest, dest_path, data=None):
+        self._ensure_writer()
+        self.jobs.put(SaveJob(digest, dest_path, data))
+
+    def export(self, entries, out_dir):
+        self._ensure_writer()
+        job = ExportJob(entries, out_dir)
+        self.exports.append(job)
+        threading.Thread(target=self._plan_export, args=(job,), daemon=True).start()
+        return job
+
+    def _plan_export(self, job):
+        try:
+            os.makedirs(job.out_dir, exist_ok=True)
+            sizes = {}
+            for digest, url, data in job.entries:
+                try:
+                    sizes[digest] = os.path.getsize(self.store.path(digest))
+                except OSError:
+                    sizes[digest] = len(data) if data is not None else None
+            names = set(os.listdir(job.out_dir))
+            existing = set()
+            wanted_sizes = set(sizes.values())
+            for name in names:
+                path = os.path.join(job.out_dir, name)
+                if job.cancelled:
+                    return
+                if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+                    continue
+                try:
+                    # 大小不同的文件内容不可能相同，不必读取
+                    if os.path.getsize(path) not in wanted_sizes:
+                        continue
+                    with open(path, 'rb') as f:
+                        existing.add(ImageStore.digest_of(f.read()))
+                except OSError:
+                    continue
+        except OSError:
+            job.failed = job.total - job.done
+            self.jobs.put(SaveJob(None, None, export=job))
+            return
+        for digest, url, data in job.entries:
+            if job.cancelled:
+                break
+            if digest in existing:
+                # 同一张图片在历史中出现多次时也只导出一次
+                job.skipped += 1
+                continue
+            existing.add(digest)
+            head = data[:32] if data is not None else self.store.read_head(digest)
+            name = image_filename(url, head)
+            if name in names:
+                name = digest[:16] + os.path.splitext(name)[1]
+            names.add(name)
+            self.jobs.put(SaveJob(digest, os.path.join(job.out_dir, name), data, export=job))
+        # 标记导出的最后一项，写入线程处理到这里即导出结束
+        self.jobs.put(SaveJob(None, None, export=job))
+
+    def _write_loop(self):
+        batch = []
+        deadline = None
+        while True:
+            try:
+                job = self.jobs.get(timeout=max(deadline - time.monotonic(), 0) if batch else None)
+            except queue.Empty:
+                self._flush(batch)
+                batch = []
+                continue
+            if job is None:
+                self._flush(batch)
                 return
+            if job.dest_path is None:
+                self._flush(batch)
+                batch = []
+                self.export_finished.emit(job.export)
+                continue
+            if job.export is not None and job.export.cancelled:
+                continue
+            try:
+                job.tmp_path = f"{job.dest_path}.{next(self._tmp_order)}.tmp"
+                if self.store.has(job.digest):
+                    self.store.export(job.digest, job.tmp_path)
+                elif job.data is not None:
+                    with open(job.tmp_path, 'wb') as f:
+                        f.write(job.data)
+                else:
+                    raise OSError("图片已不在磁盘存储中")
+            except OSError as e:
+                self._failed(job, e)
+                continue
+            if not batch:
+                deadline = time.monotonic() + SAVE_BATCH_SECONDS
+            batch.append(job)
+            if len(batch) >= SAVE_BATCH_FILES:
+                self._flush(batch)
+                batch = []
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        directories = set()
+        written = []
+        for job in batch:
+            try:
+                with open(job.tmp_path, 'rb+') as f:
+                    os.fsync(f.fileno())
+                # 目标已经是同一张图片的硬链接时，rename 什么也不做，临时文件会留下来
+                if os.path.exists(job.dest_path) and os.path.samefile(job.tmp_path, job.dest_path):
+                    os.remove(job.tmp_path)
+                else:
+                    os.replace(job.tmp_path, job.dest_path)
+            except OSError as e:
+                self._failed(job, e)
+                continue
+            directories.add(os.path.dirname(os.path.abspath(job.dest_path)))
+            written.append(job)
+        # 改名要等所在目录落盘才算完成；Windows 上不能打开目录，跳过
+        for directory in directories:
+            try:
+                fd = os.open(directory, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+        exports = []
+        for job in written:
+            if job.export is None:
+                self.saved.emit(job.dest_path)
+                continue
+            job.export.written += 1
+            if job.export not in exports:
+                exports.append(job.export)
+        for export in exports:
+            self.export_progress.emit(export)
+
+    def _failed(self, job, error):
+        if job.tmp_path:
+            try:
+                os.remove(job.tmp_path)
+            except OSError:
+                pass
+        if job.export is None:
+            self.save_failed.emit(job.dest_path, str(error))
+        else:
+            job.export.failed += 1
 
-            image_url = response.url
-            image_data_chunks = []
-            for chunk in response.iter_content(chunk_size=8192):
-                if self._is_interruption_requested:
-                    self.fetch_error.emit("下载被中断。")
-                    return
-                image_data_chunks.append(chunk)
-            image_data = b"".join(image_data_chunks)
+    def shutdown(self, timeout=5.0):
+        # 未完成的导出直接放弃，单张保存仍然写完
+        for job in self.exports:
+            job.cancelled = True
+        if self.writer is not None:
+            self.jobs.put(None)
+            self.writer.join(timeout)
+
+
+# --- 图片获取线程 ---
+# 由 FetchEngine 统一创建的常驻工作线程，从任务队列中取出任务逐个下载。
+# 使用守护线程：退出时不必等待卡在网络上的下载。
+class FetchJob:
+    def __init__(self, api_url, generation):
+        self.api_url = api_url
+        # 任务所属的代数与引擎当前代数不同即为过期，结果直接丢弃
+        self.generation = generation
+        self.connections = []
+        self.error_kind = None
+        self.retry_after = None
+        self.started = None
+        self.elapsed = 0.0
+        self.decode_time = 0.0
+        self.nbytes = 0
+        self.priority = FETCH_PRIORITY_PREFETCH
+        # 对冲请求与原任务互相引用；输给对方后 superseded 为 True
+        self.hedge = None
+        self.hedge_of = None
+        self.superseded = False
+        # 熔断后向半开的源发出的探测请求
+        self.probe = False
+        # 为 True 时边下载边解码，供界面显示部分图片
+        self.progressive = False
+        self.last_preview = 0.0
+
+
+class ImageFetcher(threading.Thread):
+    def __init__(self, engine):
+        super().__init__(daemon=True)
+        self.engine = engine
+
+    def run(self):
+        while True:
+            job = self.engine.jobs.get()[2]
+            if job is None:
+                break
+            if not self.engine.is_current(job):
+                continue
+            try:
+                self.fetch(job)
+            except RuntimeError:
+                # 窗口关闭后引擎已被销毁，信号无法再发出
+                break
+
+    def fetch(self, job):
+        job.started = time.monotonic()
+        metrics = self.engine.metrics if self.engine.metrics is not None and self.engine.metrics.enabled else None
+        timings = {} if metrics is not None else None
+        try:
+            result = download_image(self.engine.get_session(), job.api_url,
+                                    lambda: not self.engine.is_current(job), timings=timings,
+                                    on_progress=functools.partial(self.preview, job), connections=job.connections)
+            if result is None:
+                return
+            image_data, image_url = result
+            job.elapsed = time.monotonic() - job.started
+            job.nbytes = len(image_data)
 
             if not image_data:
-                self.fetch_error.emit("获取到的图片数据为空。")
+                job.error_kind = "invalid"
+                self.engine._fetch_failed.emit(job, "获取到的图片数据为空。")
                 return
 
-            pixmap = QPixmap()
-            if pixmap.loadFromData(image_data):
-                self.image_fetched.emit(pixmap, image_data, image_url)
+            # 重复图片在占用缓存位置和解码内存之前就丢弃
+            digest = ImageStore.digest_of(image_data)
+            if self.engine.duplicates is not None:
+                duplicate = self.engine.duplicates.check_and_add(digest, image_data)
+                if duplicate and self.engine.skip_duplicates:
+                    if metrics is not None:
+                        metrics.record_fetch(timings, image_url, job.nbytes, job.elapsed, duplicate)
+                    self.engine._duplicate.emit(job, duplicate)
+                    return
+
+            # 解码与缩放在工作线程完成，只产出 QImage（QPixmap 不能在非 GUI 线程使用）
+            target_size = QSize(self.engine.target_size)
+            decode_start = time.monotonic()
+            image = decode_image(image_data, target_size, timings, self.engine.pixel_ratio)
+            job.decode_time = time.monotonic() - decode_start
+            if metrics is not None:
+                metrics.record_fetch(timings, image_url, job.nbytes, time.monotonic() - job.started)
+            if not image.isNull():
+                if self.engine.store is not None:
+                    self.engine.store.put(image_data, digest)
+                self.engine._fetched.emit(job, image, target_size, image_data, image_url, digest)
             else:
-                self.fetch_error.emit("无法加载图片数据。可能是无效的图片格式。")
-        except requests.exceptions.Timeout:
-            self.fetch_error.emit(f"网络请求超时: {self.api_url}")
-        except requests.exceptions.RequestException as e:
-            self.fetch_error.emit(f"网络请求错误: {e}")
+                job.error_kind = "invalid"
+                self.engine._fetch_failed.emit(job, "无法加载图片数据。可能是无效的图片格式。")
         except Exception as e:
-            self.fetch_error.emit(f"获取图片时发生未知错误: {e}")
+            # 被取消而中断的连接会以异常结束，不再报告
+            if self.engine.is_current(job):
+                job.error_kind = fetch_error_kind(e)
+                job.retry_after = retry_after_seconds(e)
+                self.engine._fetch_failed.emit(job, fetch_error_message(e, job.api_url))
+
+    def preview(self, job, buffer, received, total):
+        # 只有界面正在等待的图片才做部分解码，预取的图片仍然下载完整后再解码
+        if not job.progressive:
+            return
+        now = time.monotonic()
+        if (now - job.last_preview) * 1000 < PROGRESSIVE_INTERVAL_MS:
+            return
+        data = bytes(memoryview(buffer)[:received])
+        if sniff_image_extension(data) not in PROGRESSIVE_FORMATS:
+            # PNG 等格式截断后无法解码，不必反复尝试
+            job.progressive = False
+            return
+        image = decode_partial(data, QSize(self.engine.target_size), self.engine.pixel_ratio)
+        job.last_preview = time.monotonic()
+        if not image.isNull():
+            self.engine._progress.emit(job, image, len(data), total or 0)
+
+
+# --- 图片获取引擎 ---
+# 固定数量的工作线程共享一个带连接池的 keep-alive Session，
+# 避免每张图片都重新握手、反复创建销毁线程。结果通过信号回到 GUI 线程。
+# 每个任务由 SourceSelector 选定图片源；所有源都在退避或熔断时不提交，到时间后发出 retry_ready。
+# 任务耗时超过所在源的 p95 且有空闲工作线程时，向另一个源发出对冲请求，先完成的胜出，另一个被取消。
+# 队列按优先级出队：界面等待或幻灯片马上要用的任务排在普通预取前面。
+class FetchEngine(QObject):
+    image_fetched = pyqtSignal(object)
+    fetch_error = pyqtSignal(str)
+    duplicate_skipped = pyqtSignal(str)
+    # 下载耗时、字节数、解码耗时
+    fetch_completed = pyqtSignal(float, int, float)
+    image_progress = pyqtSignal(QImage, int, int)
+    retry_ready = pyqtSignal()
+    breaker_changed = pyqtSignal(str)
+    _fetched = pyqtSignal(object, QImage, QSize, bytes, str, str)
+    _progress = pyqtSignal(object, QImage, int, int)
+    _fetch_failed = pyqtSignal(object, str)
+    _duplicate = pyqtSignal(object, str)
+
+    def __init__(self, sources, store=None, duplicates=None, metrics=None, workers=DEFAULT_FETCH_WORKERS, parent=None):
+        super().__init__(parent)
+        self.sources = SourceSelector(sources)
+        self.metrics = metrics
+        self.worker_count = workers
+        self.store = store
+        self.duplicates = duplicates
+        self.skip_duplicates = True
+        self.hedging = True
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.target_size = QSize(800, 600)
+        self.pixel_ratio = 1.0
+        self.session = None
+        self._session_lock = threading.Lock()
+        self.workers = []
+        # (优先级, 序号, 任务)，同一优先级内先进先出
+        self.jobs = queue.PriorityQueue()
+        self._job_order = itertools.count()
+        self.active_jobs = set()
+        # 每次取消加一，之前提交的任务全部过期
+        self.generation = 0
+        self._breaker_state = self.sources.state()
+        self.retry_timer = QTimer(self)
+        self.retry_timer.setSingleShot(True)
+        self.retry_timer.timeout.connect(self.retry_ready)
+        self.hedge_timer = QTimer(self)
+        self.hedge_timer.setInterval(HEDGE_CHECK_MS)
+        self.hedge_timer.timeout.connect(self._check_hedges)
+        # 界面等待图片时开启渐进显示，只跟随最先产出部分图片的那个任务
+        self.progressive = False
+        self.preview_job = None
+        self._fetched.connect(self._on_fetched)
+        self._progress.connect(self._on_progress)
+        self._fetch_failed.connect(self._on_fetch_failed)
+        self._duplicate.connect(self._on_duplicate)
+
+    def start(self):
+        # 窗口显示之后才启动工作线程，之前提交的任务在队列中等待
+        if self.workers:
+            return
+        self.workers = [ImageFetcher(self) for _ in range(self.worker_count)]
+        for worker in self.workers:
+            worker.start()
+
+    def get_session(self):
+        # 由第一个开始下载的工作线程导入 requests 并创建 Session，不占用 GUI 线程
+        with self._session_lock:
+            if self.session is None:
+                self.session = create_session(self.worker_count * RANGED_DOWNLOAD_PARTS)
+            return self.session
+
+    def set_sources(self, sources):
+        self.sources.set_sources(sources)
+
+    def pending(self):
+        # 对冲请求与原任务只算一张图片
+        return sum(1 for job in self.active_jobs if job.hedge_of is None)
+
+    def wait_time(self):
+        return self.sources.wait_time() or 0.0
+
+    def _update_stalled(self):
+        now = time.monotonic()
+        stalled = {}
+        for job in self.active_jobs:
+            if job.started is not None:
+                stalled[job.api_url] = max(stalled.get(job.api_url, 0.0), now - job.started)
+        for source in self.sources.sources:
+            source.stalled = stalled.get(source.url, 0.0)
+
+    def submit(self, count=1, priority=FETCH_PRIORITY_PREFETCH):
+        self._update_stalled()
+        for _ in range(count):
+            source = self.sources.choose()
+            if source is None:
+                wait = self.sources.wait_time()
+                if wait is not None and not self.retry_timer.isActive():
+                    self.retry_timer.start(int(wait * 1000) + 1)
+                break
+            job = FetchJob(source.url, self.generation)
+            job.priority = priority
+            job.probe = source.scheduler.state != FetchScheduler.CLOSED
+            self._enqueue(job)
+        self._update_breaker()
+        if self.hedging and self.active_jobs and not self.hedge_timer.isActive():
+            self.hedge_timer.start()
+
+    def _enqueue(self, job):
+        job.progressive = self.progressive and self.preview_job is None
+        self.active_jobs.add(job)
+        self.jobs.put((job.priority, next(self._job_order), job))
+
+    def is_current(self, job):
+        return job.generation == self.generation and not job.superseded
+
+    def cancel_all(self):
+        # 不等待工作线程：中断它们正在使用的连接，过期的结果到达时再丢弃
+        self.generation += 1
+        self.retry_timer.stop()
+        self.hedge_timer.stop()
+        self.sources.reset()
+        self._update_breaker()
+        for job in self.active_jobs:
+            abort_connections(job.connections)
+        self.active_jobs.clear()
+        self.preview_job = None
+
+    def _supersede(self, job):
+        # 对冲中较慢的一方：立即中断连接，之后到达的结果由 is_current 丢弃
+        job.superseded = True
+        abort_connections(job.connections)
+        if job.probe:
+            # 被丢弃的结果不会再记录到调度器，熔断后的探测名额要在这里归还，否则这个源再也不会被选中
+            source = self.sources.get(job.api_url)
+            if source is not None:
+                source.scheduler.probe_in_flight = False
+        self.active_jobs.discard(job)
+        if job is self.preview_job:
+            self.preview_job = None
+
+    def _check_hedges(self):
+        if not self.active_jobs:
+            self.hedge_timer.stop()
+            return
+        if not self.hedging:
+            return
+        # 只用空闲的工作线程发对冲请求，不挤占正常的预取
+        running = [job for job in self.active_jobs if job.started is not None]
+        idle = self.worker_count - len(running)
+        if idle <= 0 or len(running) < len(self.active_jobs):
+            return
+        self._update_stalled()
+        now = time.monotonic()
+        for job in running:
+            if idle <= 0:
+                break
+            if job.hedge is not None or job.hedge_of is not None:
+                continue
+            source = self.sources.get(job.api_url)
+            p95 = source.latency_percentile(95, SOURCE_MIN_SAMPLES) if source is not None else None
+            if p95 is None or now - job.started < p95:
+                continue
+            other = self.sources.choose(exclude={job.api_url}) or self.sources.choose()
+            if other is None:
+                break
+            hedge = FetchJob(other.url, self.generation)
+            hedge.priority = job.priority
+            hedge.probe = other.scheduler.state != FetchScheduler.CLOSED
+            hedge.hedge_of = job
+            job.hedge = hedge
+            self._enqueue(hedge)
+            self.hedges_sent += 1
+            idle -= 1
+
+    def _settle(self, job, ok, duplicate=False):
+        # 记录所在图片源的耗时与成败，并处理对冲的另一方
+        self.active_jobs.discard(job)
+        source = self.sources.get(job.api_url)
+        if source is not None:
+            latency = job.elapsed if ok else time.monotonic() - (job.started or time.monotonic())
+            source.record(latency, ok)
+            if duplicate:
+                source.scheduler.record_duplicate()
+            elif ok:
+                source.scheduler.record_success()
+            else:
+                source.scheduler.record_failure(job.error_kind or "other", job.started, job.retry_after)
+        self._update_breaker()
+        partner = job.hedge or job.hedge_of
+        job.hedge = job.hedge_of = None
+        if partner is None or not self.is_current(partner):
+            return None
+        partner.hedge = partner.hedge_of = None
+        return partner
+
+    def set_progressive(self, enabled):
+        self.progressive = enabled
+        self.preview_job = None
+        for job in self.active_jobs:
+            job.progressive = enabled
+
+    def _release_preview(self, job):
+        # 被跟随的任务失败后，重新让其余任务竞争渐进显示
+        if job is self.preview_job:
+            self.set_progressive(self.progressive)
+
+    def _update_breaker(self):
+        state = self.sources.state()
+        if state != self._breaker_state:
+            self._breaker_state = state
+            self.breaker_changed.emit(state)
+
+    def shutdown(self):
+        self.cancel_all()
+        # 退出标记排在所有任务之前
+        for _ in self.workers:
+            self.jobs.put((-1, next(self._job_order), None))
+        if self.session is not None:
+            self.session.close()
+
+    def _on_fetched(self, job, image, target_size, image_data, image_url, digest):
+        if not self.is_current(job):
+            return
+        is_hedge = job.hedge_of is not None
+        partner = self._settle(job, True)
+        if partner is not None:
+            self._supersede(partner)
+            if is_hedge:
+                self.hedges_won += 1
+        self.fetch_completed.emit(job.elapsed, job.nbytes, job.decode_time)
+        if job is self.preview_job:
+            self.preview_job = None
+        entry = ImageEntry(digest, image_url, image_data, self.store)
+        entry.set_image(image, target_size)
+        self.image_fetched.emit(entry)
+
+    def _on_fetch_failed(self, job, error_message):
+        if not self.is_current(job):
+            return
+        self._release_preview(job)
+        # 对冲的另一方还在进行时不报告错误，由它继续完成这张图片
+        if self._settle(job, False) is None:
+            self.fetch_error.emit(error_message)
+
+    def _on_duplicate(self, job, kind):
+        if not self.is_current(job):
+            return
+        self._release_preview(job)
+        self._settle(job, True, duplicate=True)
+        self.fetch_completed.emit(job.elapsed, job.nbytes, 0.0)
+        self.duplicate_skipped.emit(kind)
 
-    def requestInterruption(self):
-        self._is_interruption_requested = True
+    def _on_progress(self, job, image, received, total):
+        if not self.is_current(job) or not self.progressive:
+            return
+        if self.preview_job is None:
+            self.preview_job = job
+            for other in self.active_jobs:
+                other.progressive = other is job
+        if job is self.preview_job:
+            self.image_progress.emit(image, received, total)
 
 # --- 设置对话框 ---
 class SettingsDialog(QDialog):
@@ -76,18 +2012,54 @@ class SettingsDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("设置")
         self.setObjectName("SettingsDialog")
-        self.settings = QSettings("MyCompany", "acyViewer")
+        self.settings = QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION)
 
         layout = QFormLayout(self)
         layout.setSpacing(10)
 
-        self.api_url_edit = QLineEdit(self.settings.value("api_url", DEFAULT_API_URL))
-        layout.addRow("API URL:", self.api_url_edit)
+        # 每行一个图片源，可在 URL 后面加权重；旧版本只保存了 api_url
+        sources = parse_sources(self.settings.value("sources", "")) or [(self.settings.value("api_url", DEFAULT_API_URL), 1.0)]
+        self.sources_edit = QPlainTextEdit(format_sources(sources))
+        self.sources_edit.setPlaceholderText("每行一个: URL [权重]")
+        self.sources_edit.setFixedHeight(80)
+        layout.addRow("图片源:", self.sources_edit)
+
+        self.hedge_checkbox = QCheckBox("请求过慢时向其他图片源再发一个请求")
+        self.hedge_checkbox.setChecked(self.settings.value("hedge_requests", True, type=bool))
+        layout.addRow("对冲请求:", self.hedge_checkbox)
+
+        self.min_cache_size_spinbox = QSpinBox()
+        self.min_cache_size_spinbox.setRange(1, 20)
+        self.min_cache_size_spinbox.setValue(int(self.settings.value("min_cache_size", DEFAULT_MIN_CACHE_SIZE)))
+        layout.addRow("最小缓存数量:", self.min_cache_size_spinbox)
 
         self.cache_size_spinbox = QSpinBox()
         self.cache_size_spinbox.setRange(1, 20)
         self.cache_size_spinbox.setValue(int(self.settings.value("max_cache_size", DEFAULT_MAX_CACHE_SIZE)))
         layout.addRow("最大缓存数量:", self.cache_size_spinbox)
+        # 最小值不能超过最大值
+        self.cache_size_spinbox.valueChanged.connect(self.min_cache_size_spinbox.setMaximum)
+        self.min_cache_size_spinbox.setMaximum(self.cache_size_spinbox.value())
+
+        self.store_size_spinbox = QSpinBox()
+        self.store_size_spinbox.setRange(64, 65536)
+        self.store_size_spinbox.setSingleStep(256)
+        self.store_size_spinbox.setSuffix(" MB")
+        self.store_size_spinbox.setValue(int(self.settings.value("store_size_mb", DEFAULT_STORE_SIZE_MB)))
+        layout.addRow("磁盘缓存上限:", self.store_size_spinbox)
+
+        self.memory_budget_spinbox = QSpinBox()
+        self.memory_budget_spinbox.setRange(32, 8192)
+        self.memory_budget_spinbox.setSingleStep(32)
+        self.memory_budget_spinbox.setSuffix(" MB")
+        self.memory_budget_spinbox.setValue(int(self.settings.value("memory_budget_mb", DEFAULT_MEMORY_BUDGET_MB)))
+        layout.addRow("内存缓存上限:", self.memory_budget_spinbox)
+
+        self.slideshow_spinbox = QSpinBox()
+        self.slideshow_spinbox.setRange(1, 600)
+        self.slideshow_spinbox.setSuffix(" 秒")
+        self.slideshow_spinbox.setValue(int(self.settings.value("slideshow_interval", DEFAULT_SLIDESHOW_INTERVAL)))
+        layout.addRow("幻灯片间隔:", self.slideshow_spinbox)
 
         download_path_layout = QHBoxLayout()
         self.download_dir_edit = QLineEdit(self.settings.value("download_dir", QStandardPaths.writableLocation(QStandardPaths.PicturesLocation)))
@@ -97,6 +2069,14 @@ class SettingsDialog(QDialog):
         download_path_layout.addWidget(self.browse_button)
         layout.addRow("默认下载目录:", download_path_layout)
 
+        self.skip_duplicates_checkbox = QCheckBox("跳过看过的和相似的图片")
+        self.skip_duplicates_checkbox.setChecked(self.settings.value("skip_duplicates", True, type=bool))
+        layout.addRow("去重:", self.skip_duplicates_checkbox)
+
+        self.metrics_checkbox = QCheckBox("记录每次获取的各阶段耗时")
+        self.metrics_checkbox.setChecked(self.settings.value("metrics_enabled", True, type=bool))
+        layout.addRow("性能统计:", self.metrics_checkbox)
+
         self.theme_combo = QComboBox()
         self.theme_combo.addItems(["浅色", "深色"])
         current_theme = self.settings.value("theme", DEFAULT_THEME)
@@ -117,44 +2097,291 @@ class SettingsDialog(QDialog):
             self.download_dir_edit.setText(directory)
 
     def accept(self):
-        self.settings.setValue("api_url", self.api_url_edit.text())
+        sources = parse_sources(self.sources_edit.toPlainText()) or [(DEFAULT_API_URL, 1.0)]
+        self.settings.setValue("sources", format_sources(sources))
+        # 无界面批量下载和旧版本使用第一个图片源
+        self.settings.setValue("api_url", sources[0][0])
+        self.settings.setValue("hedge_requests", self.hedge_checkbox.isChecked())
+        self.settings.setValue("min_cache_size", self.min_cache_size_spinbox.value())
         self.settings.setValue("max_cache_size", self.cache_size_spinbox.value())
+        self.settings.setValue("store_size_mb", self.store_size_spinbox.value())
+        self.settings.setValue("memory_budget_mb", self.memory_budget_spinbox.value())
+        self.settings.setValue("slideshow_interval", self.slideshow_spinbox.value())
         self.settings.setValue("download_dir", self.download_dir_edit.text())
         self.settings.setValue("theme", self.theme_combo.currentText())
+        self.settings.setValue("skip_duplicates", self.skip_duplicates_checkbox.isChecked())
+        self.settings.setValue("metrics_enabled", self.metrics_checkbox.isChecked())
         super().accept()
 
+# --- 性能对话框 ---
+class PerformanceDialog(QDialog):
+    PHASE_NAMES = {
+        "connect": "建立连接", "redirect": "重定向解析", "ttfb": "首字节等待", "transfer": "正文传输",
+        "decode": "解码", "scale": "缩放", "total": "总耗时",
+    }
+
+    def __init__(self, viewer):
+        super().__init__(viewer)
+        self.setWindowTitle("性能")
+        self.setObjectName("PerformanceDialog")
+        self.viewer = viewer
+        self.metrics = viewer.metrics
+        self.resize(560, 520)
+
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(len(PERF_PHASES), 4)
+        self.table.setHorizontalHeaderLabels(["样本数", "p50 (ms)", "p95 (ms)", "p99 (ms)"])
+        self.table.setVerticalHeaderLabels([self.PHASE_NAMES[phase] for phase in PERF_PHASES])
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        self.sources_table = QTableWidget(0, 5)
+        self.sources_table.setHorizontalHeaderLabels(["图片源", "权重", "p50 (ms)", "p95 (ms)", "错误率"])
+        self.sources_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.sources_table.verticalHeader().hide()
+        self.sources_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.sources_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.sources_table)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.Close)
+        export_button = button_box.addButton("导出 JSONL...", QDialogButtonBox.ActionRole)
+        export_button.clicked.connect(self.export_jsonl)
+        reset_button = button_box.addButton("重置", QDialogButtonBox.ResetRole)
+        reset_button.clicked.connect(self.reset_metrics)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(1000)
+        self.refresh()
+
+    def refresh(self):
+        for row, phase in enumerate(PERF_PHASES):
+            count, values = self.metrics.percentiles(phase)
+            cells = [str(count)] + ["-" if value is None else f"{value * 1000:.1f}" for value in values]
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+        engine = self.viewer.fetch_engine
+        self.sources_table.setRowCount(len(engine.sources.sources))
+        for row, source in enumerate(engine.sources.sources):
+            state = {FetchScheduler.OPEN: "（暂停）", FetchScheduler.HALF_OPEN: "（探测中）"}.get(source.scheduler.state, "")
+            p50, p95 = source.latency_percentile(50), source.latency_percentile(95)
+            cells = [source.url + state, f"{source.weight:g}",
+                     "-" if p50 is None else f"{p50 * 1000:.0f}", "-" if p95 is None else f"{p95 * 1000:.0f}",
+                     f"{source.error_rate() * 100:.0f}%"]
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.sources_table.setItem(row, column, item)
+        hit_rate = self.metrics.hit_rate()
+        hit_text = "-" if hit_rate is None else f"{hit_rate * 100:.1f}%"
+        memory, decoded, count = self.viewer.memory_usage()
+        memory_mb = memory / 1024 / 1024
+        per_image = f"，解码结果 {count} 张，平均每张 {decoded / count / 1024 / 1024:.1f} MB" if count else ""
+        status = "" if self.metrics.enabled else "（记录已在设置中关闭）"
+        slideshow_text = "-"
+        if self.metrics.deadlines:
+            lateness = sorted(self.metrics.deadline_lateness)
+            late_text = f"，p95 延迟 {lateness[min(len(lateness) - 1, int(0.95 * len(lateness)))] * 1000:.0f} ms" if lateness else ""
+            slideshow_text = f"错过 {self.metrics.deadlines_missed}/{self.metrics.deadlines} 次{late_text}"
+        self.summary_label.setText(
+            f"缓存命中率: {hit_text}（{self.metrics.cache_hits} 次命中 / {self.metrics.cache_misses} 次等待）\n"
+            f"内存中的图片: {memory_mb:.1f} MB{per_image} | 已跳过重复: {self.viewer.duplicates_skipped} | "
+            f"对冲请求: {engine.hedges_sent} 次，胜出 {engine.hedges_won} 次\n"
+            f"幻灯片截止时间: {slideshow_text} {status}")
+
+    def export_jsonl(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出性能数据", "acyViewer-metrics.jsonl", "JSON Lines (*.jsonl)")
+        if not path:
+            return
+        try:
+            count = self.metrics.export_jsonl(path)
+            QMessageBox.information(self, "导出", f"已导出 {count} 条记录到:\n{path}")
+        except OSError as e:
+            QMessageBox.critical(self, "导出失败", f"无法写入文件: {e}")
+
+    def reset_metrics(self):
+        self.metrics.reset()
+        self.refresh()
+
+
 # --- 主窗口 ---
 class acyViewer(QMainWindow):
-    def __init__(self):
+    def __init__(self, profiler=None):
         super().__init__()
-        self.settings = QSettings("MyCompany", "acyViewer")
+        self.profiler = profiler or StartupProfiler()
+        self.startup_finished = False
+        self.settings = QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION)
 
         self.api_url = DEFAULT_API_URL
+        self.sources = [(DEFAULT_API_URL, 1.0)]
+        self.hedge_requests = True
         self.max_cache_size = DEFAULT_MAX_CACHE_SIZE
+        self.min_cache_size = DEFAULT_MIN_CACHE_SIZE
         self.download_dir = QStandardPaths.writableLocation(QStandardPaths.PicturesLocation)
         self.current_theme = DEFAULT_THEME
+        self.store_size_mb = DEFAULT_STORE_SIZE_MB
+        self.memory_budget_mb = DEFAULT_MEMORY_BUDGET_MB
+        self.skip_duplicates = True
+        self.duplicates_skipped = 0
+        self.metrics_enabled = True
 
         self.image_cache = collections.deque()
-        self.history = collections.deque(maxlen=50)
+        self.history = collections.deque(maxlen=HISTORY_MAX_LEN)
         self.current_history_index = -1
-        self.current_pixmap = None
-        self.current_image_data = None
-        self.current_image_url = None
-        self.fetchers = []
+        self.current_entry = None
+        self.waiting_for_fetch = False
+        self.scaled_cache = ScaledPixmapCache()
+        self.slideshow_interval = DEFAULT_SLIDESHOW_INTERVAL
+        self.slideshow_active = False
+        # 幻灯片到时间但下一张没有就绪时，记下应当显示的时刻，用于统计延迟
+        self.slideshow_late_since = None
+
+        # 窗口尺寸停止变化一段时间后才做高质量缩放
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(RESIZE_DEBOUNCE_MS)
+        self.resize_timer.timeout.connect(self.finish_resize)
+
+        # 每张图片显示出来之后才开始计时，下一张晚到时不会连着跳过
+        self.slideshow_timer = QTimer(self)
+        self.slideshow_timer.setSingleShot(True)
+        self.slideshow_timer.timeout.connect(self.slideshow_tick)
 
         self.load_settings()
+        self.prefetch = PrefetchController(self.min_cache_size, self.max_cache_size)
+        self.metrics = PerformanceMetrics()
+        self.metrics.enabled = self.metrics_enabled
+        self.store = ImageStore(default_store_dir(), self.store_size_mb * 1024 * 1024)
+        self.decoder = ImageDecoder(self.metrics, self)
+        self.duplicates = DuplicateIndex(os.path.join(self.store.root, "seen.sqlite3"))
+        self.fetch_engine = FetchEngine(self.sources, self.store, self.duplicates, self.metrics, parent=self)
+        self.fetch_engine.hedging = self.hedge_requests
+        self.fetch_engine.skip_duplicates = self.skip_duplicates
+        self.fetch_engine.image_fetched.connect(self.add_to_cache)
+        self.fetch_engine.fetch_error.connect(self.handle_fetch_error)
+        self.fetch_engine.duplicate_skipped.connect(self.handle_duplicate)
+        self.fetch_engine.fetch_completed.connect(self.prefetch.record_fetch)
+        self.fetch_engine.image_progress.connect(self.show_partial_image)
+        self.fetch_engine.retry_ready.connect(self.fill_cache)
+        self.fetch_engine.breaker_changed.connect(self.update_breaker_status)
+        self.thumbnails = ThumbnailLoader(self.store, self)
+        self.saver = SaveQueue(self.store, self)
+        self.saver.saved.connect(self.image_saved)
+        self.saver.save_failed.connect(self.image_save_failed)
+        self.saver.export_progress.connect(self.update_export_status)
+        self.saver.export_finished.connect(self.export_finished)
+        self.history_model = HistoryModel(self.thumbnails, self)
+        self.profiler.mark("读取设置和存储")
         self.init_ui()
+        self.profiler.mark("创建界面")
+        # 上次的图片只需读取本地存储，在窗口显示前就提交解码；网络、主题和预取等首次绘制之后再做
+        self.restore_from_store()
+        self.profiler.mark("恢复上次图片")
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.startup_finished:
+            self.profiler.mark("首次绘制", once=True)
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        if self.startup_finished:
+            return
+        self.startup_finished = True
+        # 拖到像素比不同的屏幕上时窗口尺寸不一定变化（如 macOS 的 Retina 与普通屏幕之间），不能只靠 resizeEvent
+        if self.windowHandle() is not None:
+            self.windowHandle().screenChanged.connect(self.screen_changed)
+        self.fetch_engine.start()
+        self.profiler.mark("启动下载线程")
         self.apply_theme()
+        self.profiler.mark("应用主题")
+        if self.current_entry is None:
+            self.wait_for_image()
         self.fill_cache()
+        self.sync_filmstrip()
+        self.profiler.mark("开始预取")
 
     def load_settings(self):
         self.api_url = self.settings.value("api_url", DEFAULT_API_URL)
+        self.sources = parse_sources(self.settings.value("sources", "")) or [(self.api_url, 1.0)]
+        self.hedge_requests = self.settings.value("hedge_requests", True, type=bool)
         self.max_cache_size = int(self.settings.value("max_cache_size", DEFAULT_MAX_CACHE_SIZE))
+        self.min_cache_size = min(int(self.settings.value("min_cache_size", DEFAULT_MIN_CACHE_SIZE)), self.max_cache_size)
         self.download_dir = self.settings.value("download_dir", QStandardPaths.writableLocation(QStandardPaths.PicturesLocation))
         if not os.path.isdir(self.download_dir):
             self.download_dir = QStandardPaths.writableLocation(QStandardPaths.PicturesLocation)
             self.settings.setValue("download_dir", self.download_dir)
         self.current_theme = self.settings.value("theme", DEFAULT_THEME)
+        self.store_size_mb = int(self.settings.value("store_size_mb", DEFAULT_STORE_SIZE_MB))
+        self.memory_budget_mb = int(self.settings.value("memory_budget_mb", DEFAULT_MEMORY_BUDGET_MB))
+        self.slideshow_interval = int(self.settings.value("slideshow_interval", DEFAULT_SLIDESHOW_INTERVAL))
+        self.skip_duplicates = self.settings.value("skip_duplicates", True, type=bool)
+        self.show_filmstrip = self.settings.value("show_filmstrip", False, type=bool)
+        self.metrics_enabled = self.settings.value("metrics_enabled", True, type=bool)
+
+    def restore_from_store(self):
+        # 恢复上次会话的历史与预取缓存，只读取索引，图片数据在显示时才从磁盘读入
+        for digest, url in self.store.load_list("history"):
+            self.history.append(ImageEntry(digest, url, store=self.store))
+        for digest, url in self.store.load_list("cache")[:self.max_cache_size]:
+            self.image_cache.append(ImageEntry(digest, url, store=self.store))
+        if not self.history:
+            return
+        index = int(self.store.get_meta("history_index", len(self.history) - 1))
+        self.current_history_index = min(max(index, 0), len(self.history) - 1)
+        self.trim_history()
+        self.history_model.set_entries(self.history)
+        self.display_image(self.history[self.current_history_index])
+        self.update_memory_tiers()
+        self.statusBar().showMessage(f"已恢复上次浏览。历史: {self.current_history_index + 1}/{len(self.history)} | {KEYBOARD_SHORTCUTS_TIP}")
+
+    def set_filmstrip_visible(self, visible):
+        self.show_filmstrip = visible
+        self.settings.setValue("show_filmstrip", visible)
+        self.filmstrip.setVisible(visible)
+        self.sync_filmstrip()
+
+    def trim_history(self):
+        # 历史引用的图片不会被磁盘存储淘汰。历史占用超过磁盘缓存上限的 HISTORY_STORE_SHARE 时
+        # 丢弃最早的历史，否则上限会失效；当前图片始终保留
+        unknown = [entry.digest for entry in self.history if entry.size is None]
+        if unknown:
+            sizes = self.store.sizes(unknown)
+            for entry in self.history:
+                if entry.size is None:
+                    entry.size = sizes.get(entry.digest, 0)
+        limit = self.store.max_bytes * HISTORY_STORE_SHARE
+        total = sum(entry.size for entry in self.history)
+        while total > limit and self.current_history_index > 0:
+            total -= self.history.popleft().size
+            self.current_history_index -= 1
+
+    def history_changed(self):
+        self.trim_history()
+        self.history_model.set_entries(self.history)
+        self.sync_filmstrip()
+
+    def sync_filmstrip(self):
+        # 高亮当前图片并滚动到可见位置；隐藏时不做任何事，缩略图也不会生成
+        if not self.filmstrip.isVisible() or self.current_history_index < 0:
+            return
+        index = self.history_model.index(self.current_history_index)
+        self.filmstrip.setCurrentIndex(index)
+        self.filmstrip.scrollTo(index, QListView.PositionAtCenter)
+
+    def persist_state(self):
+        self.store.save_list("history", self.history)
+        self.store.save_list("cache", self.image_cache)
+        self.store.set_meta("history_index", self.current_history_index)
 
     def init_ui(self):
         self.setWindowTitle("acy 图片查看器")
@@ -173,18 +2400,28 @@ class acyViewer(QMainWindow):
         self.image_label.setMinimumSize(600, 400)
         main_layout.addWidget(self.image_label, 1)
 
-        # 直接使用内嵌的base64编码的GIF数据，不依赖外部文件
-        gif_data_b64 = "R0lGODlhKAAoAPMAAP///wAAAMLCwkJCQgAAAGJiYoKCgpKSkiH/C05FVFNDQVBFMi4wAwEAAAAh/hpDcmVhdGVkIHdpdGggYWpheGxvYWQuaW5mbwAh+QQJCgAAACwAAAAAKAAoAAAE5xDISWlZKoqzqv27sgvL9LDBVON9GgNAdBGBBCMRHAQCI8E+hHAcgZkYyGCkMatFWq1nI2L3WJ3W4XzBbE4H9p1ZlDEsBsFNrGgDqD7rF+sMDGB0fP85q57a877s/l9+D25vbx1gZ2FnaJljQxAlhZgZl5kBlHAFHAlxKnFnk2luQgpwdGgAn2KdkpafA6IpqKqtrq+wsbKztLW2t7i5uru8vb6/wMHCw8TFxsfIycrLzM3Oz9DR0tPU1dbX2Nna29zd3t/g4eLj5OXm5+jp6uvs7e7v8PHy8/T19vf4+fr7/P3+/////ywAAAAAKAAoAAAE7hDISWlZKoqzqv27sgvL9LDBVON9GgNAdBGBBCMRHAQCI8E+hHAcgZkYyGCkMatFWq1nI2L3WJ3W4XzBbE4H9p1ZlDEsBsFNrGgDqD7rF+sMDGB0fP85q57a877s/l9+D25vbx1gZ2FnaJljQxAlhZgZl5kBlHAFHAlxKnFnk2luQgpwdGgAn2KdkpafA6IpqKqtrq+wsbKztLW2t7i5uru8vb6/wMHCw8TFxsfIycrLzM3Oz9DR0tPU1dbX2Nna29zd3t/g4eLj5OXm5+jp6uvs7e7v8PHy8/T19vf4+fr7/P3+/////wA="
-        gif_data = base64.b64decode(gif_data_b64)
-        # 使用QBuffer来加载二进制数据到QMovie
-        buffer = QBuffer()
-        buffer.setData(QByteArray(gif_data))
-        buffer.open(QBuffer.ReadOnly)
-        self.loading_movie = QMovie()
-        self.loading_movie.setDevice(buffer)
-        # 保持buffer的引用，防止被垃圾回收
-        self.buffer = buffer
-        self.loading_movie.setScaledSize(QSize(80,80))
+        # 历史胶片栏：QListView 只绘制和请求可见的条目，历史很长时也不会变慢
+        self.filmstrip = QListView()
+        self.filmstrip.setObjectName("filmstrip")
+        self.filmstrip.setModel(self.history_model)
+        self.filmstrip.setViewMode(QListView.IconMode)
+        self.filmstrip.setFlow(QListView.LeftToRight)
+        self.filmstrip.setWrapping(False)
+        self.filmstrip.setMovement(QListView.Static)
+        self.filmstrip.setUniformItemSizes(True)
+        self.filmstrip.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.filmstrip.setGridSize(QSize(THUMBNAIL_SIZE + 8, THUMBNAIL_SIZE + 8))
+        self.filmstrip.setHorizontalScrollMode(QListView.ScrollPerPixel)
+        self.filmstrip.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.filmstrip.setFixedHeight(THUMBNAIL_SIZE + 8 + self.filmstrip.style().pixelMetric(QStyle.PM_ScrollBarExtent) + 6)
+        # 不抢键盘焦点，空格、A、D 仍由主窗口处理
+        self.filmstrip.setFocusPolicy(Qt.NoFocus)
+        self.filmstrip.clicked.connect(lambda index: self.show_history_index(index.row()))
+        self.filmstrip.setVisible(self.show_filmstrip)
+        main_layout.addWidget(self.filmstrip)
+
+        # 加载动画在第一次需要时才创建
+        self.loading_movie = None
 
         button_layout = QHBoxLayout()
         button_layout.setSpacing(10)
@@ -231,6 +2468,14 @@ class acyViewer(QMainWindow):
         file_menu = menubar.addMenu("文件")
         create_menu_action(file_menu, "设置...", QStyle.SP_FileDialogDetailedView, 
                           "Ctrl+,", "打开设置对话框 (Ctrl+,)", self.open_settings_dialog)
+        create_menu_action(file_menu, "性能...", QStyle.SP_FileDialogInfoView,
+                          "Ctrl+P", "查看获取耗时、缓存命中率等性能数据 (Ctrl+P)", self.open_performance_dialog)
+        file_menu.addSeparator()
+        create_menu_action(file_menu, "保存全部历史...", QStyle.SP_DialogSaveButton, None,
+                          "把浏览历史中的所有图片保存到一个目录", lambda: self.export_images("history"))
+        create_menu_action(file_menu, "保存全部缓存...", None, None,
+                          "把已预取但尚未查看的图片保存到一个目录", lambda: self.export_images("cache"))
+        file_menu.addSeparator()
         create_menu_action(file_menu, "退出", QStyle.SP_DialogCloseButton, 
                           "Ctrl+Q", "退出应用程序 (Ctrl+Q)", self.close)
         
@@ -242,122 +2487,334 @@ class acyViewer(QMainWindow):
         # 下一张菜单项（特殊处理，因为有两个快捷键）
         next_action_menu = create_menu_action(navigate_menu, "下一张 (Space/D)", None, 
                                            Qt.Key_Space, "查看下一张图片 (Space / D)", self.show_next_image)
+        navigate_menu.addSeparator()
+        self.slideshow_action = create_menu_action(navigate_menu, "幻灯片放映", QStyle.SP_MediaPlay,
+                                                   Qt.Key_F5, "按设置的间隔自动显示下一张 (F5，Esc 停止)")
+        self.slideshow_action.setCheckable(True)
+        self.slideshow_action.toggled.connect(self.set_slideshow)
         # --- 导航菜单结束 ---
 
+        view_menu = menubar.addMenu("视图")
+        self.filmstrip_action = create_menu_action(view_menu, "历史胶片栏", None, "Ctrl+H",
+                                                   "显示历史缩略图，点击跳转 (Ctrl+H)")
+        self.filmstrip_action.setCheckable(True)
+        self.filmstrip_action.setChecked(self.show_filmstrip)
+        self.filmstrip_action.toggled.connect(self.set_filmstrip_visible)
+
         # 更新状态栏初始消息以包含快捷键提示
         self.statusBar().showMessage(f"准备就绪 | {KEYBOARD_SHORTCUTS_TIP}")
+        # 熔断状态常驻显示在状态栏右侧，正常时隐藏
+        self.breaker_label = QLabel()
+        self.breaker_label.hide()
+        self.statusBar().addPermanentWidget(self.breaker_label)
+        self.export_label = QLabel()
+        self.export_label.hide()
+        self.statusBar().addPermanentWidget(self.export_label)
+
+    def create_loading_movie(self):
+        # 直接使用内嵌的base64编码的GIF数据，不依赖外部文件
+        gif_data_b64 = "R0lGODlhKAAoAPMAAP///wAAAMLCwkJCQgAAAGJiYoKCgpKSkiH/C05FVFNDQVBFMi4wAwEAAAAh/hpDcmVhdGVkIHdpdGggYWpheGxvYWQuaW5mbwAh+QQJCgAAACwAAAAAKAAoAAAE5xDISWlZKoqzqv27sgvL9LDBVON9GgNAdBGBBCMRHAQCI8E+hHAcgZkYyGCkMatFWq1nI2L3WJ3W4XzBbE4H9p1ZlDEsBsFNrGgDqD7rF+sMDGB0fP85q57a877s/l9+D25vbx1gZ2FnaJljQxAlhZgZl5kBlHAFHAlxKnFnk2luQgpwdGgAn2KdkpafA6IpqKqtrq+wsbKztLW2t7i5uru8vb6/wMHCw8TFxsfIycrLzM3Oz9DR0tPU1dbX2Nna29zd3t/g4eLj5OXm5+jp6uvs7e7v8PHy8/T19vf4+fr7/P3+/////ywAAAAAKAAoAAAE7hDISWlZKoqzqv27sgvL9LDBVON9GgNAdBGBBCMRHAQCI8E+hHAcgZkYyGCkMatFWq1nI2L3WJ3W4XzBbE4H9p1ZlDEsBsFNrGgDqD7rF+sMDGB0fP85q57a877s/l9+D25vbx1gZ2FnaJljQxAlhZgZl5kBlHAFHAlxKnFnk2luQgpwdGgAn2KdkpafA6IpqKqtrq+wsbKztLW2t7i5uru8vb6/wMHCw8TFxsfIycrLzM3Oz9DR0tPU1dbX2Nna29zd3t/g4eLj5OXm5+jp6uvs7e7v8PHy8/T19vf4+fr7/P3+/////wA="
+        gif_data = base64.b64decode(gif_data_b64)
+        # 使用QBuffer来加载二进制数据到QMovie
+        buffer = QBuffer()
+        buffer.setData(QByteArray(gif_data))
+        buffer.open(QBuffer.ReadOnly)
+        self.loading_movie = QMovie()
+        self.loading_movie.setDevice(buffer)
+        # 保持buffer的引用，防止被垃圾回收
+        self.buffer = buffer
+        self.loading_movie.setScaledSize(QSize(80,80))
 
     def start_loading_animation(self):
+        if self.loading_movie is None:
+            self.create_loading_movie()
         self.image_label.setMovie(self.loading_movie)
         self.loading_movie.start()
         self.image_label.setAlignment(Qt.AlignCenter)
 
     def stop_loading_animation(self):
+        if self.loading_movie is None:
+            return
         self.loading_movie.stop()
         self.image_label.setMovie(None)
 
+    def cache_status(self):
+        return f"缓存: {len(self.image_cache)}/{self.prefetch.target_depth(self.fetch_engine.worker_count)}"
+
     def fill_cache(self):
-        self.fetchers = [f for f in self.fetchers if f.isRunning()]
-        needed = self.max_cache_size - len(self.image_cache) - len(self.fetchers)
-        for _ in range(max(0, needed)):
-            if len(self.image_cache) + len(self.fetchers) < self.max_cache_size:
-                fetcher = ImageFetcher(self.api_url)
-                fetcher.image_fetched.connect(self.add_to_cache)
-                fetcher.fetch_error.connect(self.handle_fetch_error)
-                fetcher.finished.connect(lambda f=fetcher: self.fetchers.remove(f) if f in self.fetchers else None)
-                self.fetchers.append(fetcher)
-                fetcher.start()
-
-    def add_to_cache(self, pixmap, image_data, image_url):
+        # 预取深度由 PrefetchController 根据翻页速度和获取耗时动态决定，幻灯片放映时按截止时间规划
+        target = self.prefetch.target_depth(self.fetch_engine.worker_count)
+        pending = self.fetch_engine.pending()
+        needed = target - len(self.image_cache) - pending
+        if needed <= 0:
+            return
+        # 界面正在等待的，以及幻灯片在提前量之内就要用到的，排在普通预取前面
+        if self.waiting_for_fetch:
+            urgent = needed
+        else:
+            urgent = min(max(self.prefetch.slideshow_depth() - len(self.image_cache) - pending, 0), needed)
+        if urgent:
+            self.fetch_engine.submit(urgent, FETCH_PRIORITY_URGENT)
+        if needed > urgent:
+            self.fetch_engine.submit(needed - urgent)
+
+    def add_to_cache(self, entry):
         if len(self.image_cache) < self.max_cache_size:
-            self.image_cache.append((pixmap, image_data, image_url))
-            self.statusBar().showMessage(f"缓存成功。缓存: {len(self.image_cache)}/{self.max_cache_size} | {KEYBOARD_SHORTCUTS_TIP}")
-        if not self.current_pixmap and self.image_cache:
+            self.image_cache.append(entry)
+            self.store.save_list("cache", self.image_cache)
+            self.update_memory_tiers()
+            self.statusBar().showMessage(f"缓存成功。{self.cache_status()} | {KEYBOARD_SHORTCUTS_TIP}")
+        if (not self.current_entry or self.waiting_for_fetch) and self.image_cache:
             self.show_next_image()
         self.fill_cache()
 
     def handle_fetch_error(self, error_message):
-        self.statusBar().showMessage(f"错误: {error_message} | {KEYBOARD_SHORTCUTS_TIP}")
-        if not self.current_pixmap and not self.image_cache:
+        if not self.current_entry and not self.image_cache:
             self.stop_loading_animation()
             self.image_label.setText(f"获取图片失败:\n{error_message[:150]}...")
             self.image_label.setAlignment(Qt.AlignCenter)
+        # 是否立即重试由 FetchScheduler 决定，退避期间 fill_cache 不会发出请求
         self.fill_cache()
+        wait = self.fetch_engine.wait_time()
+        retry = f"，{math.ceil(wait)} 秒后重试" if wait > 0 else ""
+        self.statusBar().showMessage(f"错误: {error_message}{retry} | {KEYBOARD_SHORTCUTS_TIP}")
+
+    def update_breaker_status(self, state):
+        if state == FetchScheduler.OPEN:
+            wait = math.ceil(self.fetch_engine.wait_time())
+            self.breaker_label.setText(f"连续获取失败，已暂停 {wait} 秒")
+        elif state == FetchScheduler.HALF_OPEN:
+            self.breaker_label.setText("正在尝试恢复获取...")
+        self.breaker_label.setVisible(state != FetchScheduler.CLOSED)
+
+    def handle_duplicate(self, kind):
+        self.duplicates_skipped += 1
+        reason = "重复" if kind == "exact" else "相似"
+        self.fill_cache()
+        # 连续获取到看过的图片时图片源会退避，这时多半已经没有新图片了
+        wait = self.fetch_engine.wait_time()
+        if wait > 0 and not self.fetch_engine.pending():
+            self.statusBar().showMessage(f"连续获取到看过的图片，可能已经没有新图片，{wait:.0f} 秒后再试。{self.cache_status()} | {KEYBOARD_SHORTCUTS_TIP}")
+        else:
+            self.statusBar().showMessage(f"跳过{reason}图片，已跳过 {self.duplicates_skipped} 张。{self.cache_status()} | {KEYBOARD_SHORTCUTS_TIP}")
 
-    def display_image(self, pixmap, image_data, image_url):
-        self.stop_loading_animation()
-        self.current_pixmap = pixmap
-        self.current_image_data = image_data
-        self.current_image_url = image_url
-
-        scaled_pixmap = pixmap.scaled(self.image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.image_label.setPixmap(scaled_pixmap)
-        self.image_label.setAlignment(Qt.AlignCenter)
+    def wait_for_image(self):
+        # 缓存为空时，正在下载的图片边下载边显示，不必等最后一个字节
+        if self.waiting_for_fetch:
+            return
+        self.waiting_for_fetch = True
+        self.fetch_engine.set_progressive(True)
+        self.start_loading_animation()
 
+    def show_partial_image(self, image, received, total):
+        if not self.waiting_for_fetch:
+            return
+        self.show_pixmap(QPixmap.fromImage(image), final=False)
+        progress = f"{received * 100 // total}%" if total else f"{received // 1024} KB"
+        self.statusBar().showMessage(f"正在下载图片... {progress} | {KEYBOARD_SHORTCUTS_TIP}")
+
+    def display_image(self, entry):
+        if self.waiting_for_fetch:
+            self.waiting_for_fetch = False
+            self.fetch_engine.set_progressive(False)
+        self.current_entry = entry
         self.download_button.setEnabled(True)
         self.copy_button.setEnabled(True)
-        # 状态栏信息可以保持简洁，快捷键提示主要通过ToolTip和菜单
-        # self.statusBar().showMessage(f"当前: {image_url}")
+
+        size = self.image_label.size()
+        pixmap = self.cached_pixmap(entry, size)
+        if pixmap is not None:
+            self.show_pixmap(pixmap)
+            return
+        # 尺寸不符或尚未解码：交给解码线程池，完成后再显示。启动阶段不创建加载动画
+        if entry.pixmap is None:
+            if self.startup_finished:
+                self.start_loading_animation()
+        else:
+            self.show_pixmap(entry.pixmap)
+        self.request_decode(entry, size, DECODE_PRIORITY_CURRENT)
+
+    def cached_pixmap(self, entry, size):
+        pixmap = entry.pixmap_for(size)
+        if pixmap is None:
+            pixmap = self.scaled_cache.get(entry.digest, size)
+            if pixmap is not None:
+                entry.set_pixmap(pixmap, size)
+        return pixmap
+
+    def show_pixmap(self, pixmap, final=True):
+        self.profiler.mark("首张图片", once=True)
+        self.stop_loading_animation()
+        self.image_label.setPixmap(pixmap)
+        self.image_label.setAlignment(Qt.AlignCenter)
+        if final and self.slideshow_active:
+            self.slideshow_shown()
+
+    def set_slideshow(self, enabled):
+        self.slideshow_active = enabled
+        self.slideshow_late_since = None
+        self.prefetch.slideshow_interval = self.slideshow_interval if enabled else None
+        if not enabled:
+            self.slideshow_timer.stop()
+            self.statusBar().showMessage(f"幻灯片已停止。 | {KEYBOARD_SHORTCUTS_TIP}")
+            return
+        # 还没有图片时，等第一张显示出来再开始计时
+        if self.current_entry is not None and not self.waiting_for_fetch:
+            self.slideshow_timer.start(int(self.slideshow_interval * 1000))
+        self.update_memory_tiers()
+        self.fill_cache()
+        self.statusBar().showMessage(f"幻灯片放映中，每 {self.slideshow_interval} 秒一张，Esc 停止。{self.cache_status()} | {KEYBOARD_SHORTCUTS_TIP}")
+
+    def upcoming_entry(self):
+        if self.current_history_index != -1 and self.current_history_index < len(self.history) - 1:
+            return self.history[self.current_history_index + 1]
+        return self.image_cache[0] if self.image_cache else None
+
+    def slideshow_tick(self):
+        # 到了显示下一张的时间：下一张已经解码并缩放到当前尺寸才算按时
+        entry = self.upcoming_entry()
+        ready = entry is not None and self.cached_pixmap(entry, self.image_label.size()) is not None
+        self.metrics.record_deadline(not ready)
+        if not ready:
+            self.slideshow_late_since = time.monotonic()
+        self.show_next_image()
+
+    def slideshow_shown(self):
+        if self.slideshow_late_since is not None:
+            self.metrics.record_lateness(time.monotonic() - self.slideshow_late_since)
+            self.slideshow_late_since = None
+        if not self.slideshow_timer.isActive():
+            self.slideshow_timer.start(int(self.slideshow_interval * 1000))
+
+    def request_decode(self, entry, size, priority=DECODE_PRIORITY_NORMAL):
+        if entry.decoding_size == size:
+            return
+        entry.decoding_size = QSize(size)
+        def on_decoded(image):
+            entry.decoding_size = None
+            if image.isNull():
+                if entry is self.current_entry:
+                    self.stop_loading_animation()
+                    self.statusBar().showMessage(f"无法读取缓存的图片。 | {KEYBOARD_SHORTCUTS_TIP}")
+                return
+            entry.set_image(image, size)
+            self.scaled_cache.put(entry.digest, size, entry.pixmap)
+            if entry is self.current_entry and self.image_label.size() == size:
+                self.show_pixmap(entry.pixmap)
+        self.decoder.submit(entry, size, on_decoded, priority)
+
+    def update_memory_tiers(self):
+        # 历史之后紧接着就是预取缓存，按这个顺序计算与当前图片的距离
+        sequence = list(self.history) + list(self.image_cache)
+        current = self.current_history_index
+        size = QSize(self.image_label.size())
+        # 幻灯片放映时，截止时间在提前量之内的图片都要提前解码好
+        ahead = max(DECODED_NEIGHBOURS, self.prefetch.slideshow_depth())
+
+        def keep_decoded(i):
+            return -DECODED_NEIGHBOURS <= i - current <= ahead
+
+        for i, entry in enumerate(sequence):
+            if keep_decoded(i):
+                if entry is not self.current_entry and self.cached_pixmap(entry, size) is None:
+                    # 预先解码相邻的图片，翻页时无需等待
+                    upcoming = self.slideshow_active and i > current
+                    self.request_decode(entry, size, DECODE_PRIORITY_UPCOMING if upcoming else DECODE_PRIORITY_NORMAL)
+            elif i < len(self.history):
+                # 看过的历史只保留压缩数据；预取的图片还没显示过，尽量保留解码结果
+                entry.release_pixmap()
+
+        budget = self.memory_budget_mb * 1024 * 1024
+        self.scaled_cache.max_bytes = int(budget * SCALED_CACHE_BUDGET_SHARE)
+        held = {entry.pixmap.cacheKey() for entry in sequence if entry.pixmap is not None}
+        total = sum(entry.memory_bytes() for entry in sequence) + self.scaled_cache.unshared_bytes(held)
+        if total <= budget:
+            return
+        # 超出预算时先丢掉只在缩放结果缓存中的 pixmap，
+        # 再按距离从远到近，先释放预取图片的 pixmap，再释放压缩数据
+        total -= self.scaled_cache.shrink(held, total - budget)
+        if total <= budget:
+            return
+        by_distance = sorted(range(len(sequence)), key=lambda i: abs(i - current), reverse=True)
+        for release_pixmaps in (True, False):
+            for i in by_distance:
+                entry = sequence[i]
+                if entry is self.current_entry:
+                    continue
+                before = entry.memory_bytes()
+                if not release_pixmaps:
+                    entry.release_data()
+                elif not keep_decoded(i):
+                    entry.release_pixmap()
+                    # 缩放结果缓存里的同一张 pixmap 也要丢掉，否则内存并没有释放
+                    self.scaled_cache.discard(entry.digest)
+                total -= before - entry.memory_bytes()
+                if total <= budget:
+                    return
+
+    def show_history_index(self, index):
+        if not 0 <= index < len(self.history):
+            return
+        self.current_history_index = index
+        self.display_image(self.history[index])
+        self.store.set_meta("history_index", index)
+        self.update_memory_tiers()
+        self.sync_filmstrip()
+        self.statusBar().showMessage(f"历史: {index + 1}/{len(self.history)} | {KEYBOARD_SHORTCUTS_TIP}")
 
     def show_next_image(self):
         if self.current_history_index != -1 and self.current_history_index < len(self.history) - 1:
-            self.current_history_index += 1
-            pixmap, image_data, img_url = self.history[self.current_history_index]
-            self.display_image(pixmap, image_data, img_url)
-            self.statusBar().showMessage(f"历史: {self.current_history_index + 1}/{len(self.history)} | {KEYBOARD_SHORTCUTS_TIP}")
+            self.metrics.record_cache(True)
+            self.show_history_index(self.current_history_index + 1)
         elif self.image_cache:
-            pixmap, image_data, img_url = self.image_cache.popleft()
-            self.display_image(pixmap, image_data, img_url)
+            self.metrics.record_cache(True)
+            self.prefetch.record_navigation()
+            entry = self.image_cache.popleft()
+            img_url = entry.url
+            self.display_image(entry)
 
             if self.current_history_index == -1 or \
-               (self.current_history_index < len(self.history) -1 and self.history[self.current_history_index+1][2] != img_url) or \
-               (self.current_history_index == len(self.history) -1 and (not self.history or self.history[-1][2] != img_url)):
+               (self.current_history_index < len(self.history) -1 and self.history[self.current_history_index+1].url != img_url) or \
+               (self.current_history_index == len(self.history) -1 and (not self.history or self.history[-1].url != img_url)):
                 if self.current_history_index != -1 and self.current_history_index < len(self.history) -1:
-                    temp_history = collections.deque(list(self.history)[:self.current_history_index + 1])
+                    temp_history = collections.deque(list(self.history)[:self.current_history_index + 1], maxlen=HISTORY_MAX_LEN)
                     self.history = temp_history
-                self.history.append((pixmap, image_data, img_url))
+                self.history.append(entry)
                 self.current_history_index = len(self.history) - 1
+                self.history_changed()
+            self.persist_state()
+            self.update_memory_tiers()
 
-            self.statusBar().showMessage(f"显示缓存。缓存: {len(self.image_cache)}/{self.max_cache_size} | {KEYBOARD_SHORTCUTS_TIP}")
+            self.statusBar().showMessage(f"显示缓存。{self.cache_status()} | {KEYBOARD_SHORTCUTS_TIP}")
             self.fill_cache()
         else:
-            self.start_loading_animation()
+            self.metrics.record_cache(False)
+            self.prefetch.record_navigation()
+            self.wait_for_image()
             self.statusBar().showMessage(f"缓存为空，正在获取新图片... | {KEYBOARD_SHORTCUTS_TIP}")
             self.fill_cache()
-            if not self.fetchers and not self.image_cache:
+            # 幻灯片放映时不弹出对话框，恢复获取后会继续
+            if not self.fetch_engine.pending() and not self.image_cache and not self.slideshow_active:
                  QMessageBox.information(self, "提示", "所有图片源尝试失败或缓存为空。\n请检查网络连接和API URL设置。")
                  self.stop_loading_animation()
                  self.image_label.setText("无可用图片。")
 
     def show_previous_image(self):
         if self.history and self.current_history_index > 0:
-            self.current_history_index -= 1
-            pixmap, image_data, img_url = self.history[self.current_history_index]
-            self.display_image(pixmap, image_data, img_url)
-            self.statusBar().showMessage(f"历史: {self.current_history_index + 1}/{len(self.history)} | {KEYBOARD_SHORTCUTS_TIP}")
+            self.show_history_index(self.current_history_index - 1)
         elif self.history and self.current_history_index == 0:
              self.statusBar().showMessage(f"已是历史记录第一张。 | {KEYBOARD_SHORTCUTS_TIP}")
         else:
             self.statusBar().showMessage(f"没有更多历史记录。 | {KEYBOARD_SHORTCUTS_TIP}")
 
     def download_current_image(self):
-        if not self.current_image_data or not self.current_image_url:
+        entry = self.current_entry
+        if not entry or not entry.url or not entry.digest:
             QMessageBox.warning(self, "下载失败", "没有当前图片可供下载。")
             return
         try:
-            filename_base = os.path.basename(self.current_image_url.split('?')[0])
-            filename, ext = os.path.splitext(filename_base)
-            if not ext or ext.lower() not in ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp']:
-                img_format = QImage.fromData(self.current_image_data).format()
-                # 使用字典映射简化格式判断
-                format_to_ext = {
-                    QImage.Format_PNG: ".png",
-                    QImage.Format_JPEG: ".jpg",
-                    QImage.Format_GIF: ".gif",
-                    QImage.Format_BMP: ".bmp"
-                }
-                ext = format_to_ext.get(img_format, ".jpg")
-            filename = (filename if filename else "image") + ext
+            head = entry._data[:32] if entry._data is not None else self.store.read_head(entry.digest)
+            filename = image_filename(entry.url, head)
         except Exception:
             filename = "image.jpg"
 
@@ -374,18 +2831,58 @@ class acyViewer(QMainWindow):
             "图片文件 (*.png *.jpg *.jpeg *.gif *.bmp *.webp)"
         )
         if filepath:
-            try:
-                with open(filepath, 'wb') as f:
-                    f.write(self.current_image_data)
-                self.statusBar().showMessage(f"图片已保存到: {filepath} | {KEYBOARD_SHORTCUTS_TIP}")
-            except Exception as e:
-                QMessageBox.critical(self, "保存失败", f"无法保存图片: {e}")
+            # 写入在后台完成；图片已在磁盘存储中时直接硬链接/复制，不再重复写入数据
+            self.saver.save(entry.digest, filepath, entry._data)
+            self.statusBar().showMessage(f"正在保存: {filepath} | {KEYBOARD_SHORTCUTS_TIP}")
+
+    def image_saved(self, filepath):
+        self.statusBar().showMessage(f"图片已保存到: {filepath} | {KEYBOARD_SHORTCUTS_TIP}")
+
+    def image_save_failed(self, filepath, error):
+        QMessageBox.critical(self, "保存失败", f"无法保存图片 {filepath}: {error}")
+
+    def export_images(self, kind):
+        entries = list(self.history) if kind == "history" else list(self.image_cache)
+        if not entries:
+            self.statusBar().showMessage(f"没有可保存的图片。 | {KEYBOARD_SHORTCUTS_TIP}")
+            return
+        out_dir = QFileDialog.getExistingDirectory(self, "选择保存目录", self.download_dir)
+        if not out_dir:
+            return
+        self.saver.export([(entry.digest, entry.url, entry._data) for entry in entries], out_dir)
+        self.update_export_status()
+
+    def update_export_status(self, export=None):
+        active = [job for job in self.saver.exports if not job.cancelled]
+        if not active:
+            self.export_label.hide()
+            return
+        done = sum(job.done for job in active)
+        total = sum(job.total for job in active)
+        self.export_label.setText(f"正在保存: {done}/{total}")
+        self.export_label.show()
+
+    def export_finished(self, export):
+        if export in self.saver.exports:
+            self.saver.exports.remove(export)
+        self.update_export_status()
+        message = f"已保存 {export.written} 张到 {export.out_dir}"
+        if export.skipped:
+            message += f"，跳过已存在的 {export.skipped} 张"
+        if export.failed:
+            message += f"，{export.failed} 张失败"
+        self.statusBar().showMessage(f"{message} | {KEYBOARD_SHORTCUTS_TIP}")
 
     def copy_image_to_clipboard(self):
-        if self.current_pixmap:
-            clipboard = QApplication.clipboard()
-            clipboard.setImage(self.current_pixmap.toImage())
-            self.statusBar().showMessage(f"图片已复制到剪贴板。 | {KEYBOARD_SHORTCUTS_TIP}")
+        if self.current_entry:
+            # 剪贴板需要原始分辨率，同样在解码线程池中完成
+            def on_decoded(image):
+                if image.isNull():
+                    self.statusBar().showMessage(f"无法读取当前图片。 | {KEYBOARD_SHORTCUTS_TIP}")
+                    return
+                QApplication.clipboard().setImage(image)
+                self.statusBar().showMessage(f"图片已复制到剪贴板。 | {KEYBOARD_SHORTCUTS_TIP}")
+            self.decoder.submit(self.current_entry, None, on_decoded)
         else:
             self.statusBar().showMessage(f"没有图片可复制。 | {KEYBOARD_SHORTCUTS_TIP}")
 
@@ -404,46 +2901,111 @@ class acyViewer(QMainWindow):
             self.show_previous_image()
         elif modifiers == Qt.ControlModifier and key == Qt.Key_S:
             self.download_current_image()
+        elif key == Qt.Key_Escape and self.slideshow_active:
+            self.slideshow_action.setChecked(False)
         # Ctrl+, 和 Ctrl+Q 由 QAction 的快捷键处理，无需在此处重复
         else:
             super().keyPressEvent(event)
 
+    def update_pixel_ratio(self):
+        # 换到像素比不同的屏幕后，已缩放的图片都要按新的物理尺寸重新解码
+        ratio = self.devicePixelRatioF()
+        if ratio == self.decoder.pixel_ratio:
+            return False
+        self.decoder.pixel_ratio = self.fetch_engine.pixel_ratio = ratio
+        self.scaled_cache.clear()
+        for entry in list(self.history) + list(self.image_cache):
+            entry.release_pixmap()
+        return True
+
+    def screen_changed(self, screen):
+        if self.update_pixel_ratio() and self.current_entry is not None and not self.waiting_for_fetch:
+            self.display_image(self.current_entry)
+            self.update_memory_tiers()
+
     def resizeEvent(self, event):
-        if self.current_pixmap:
-            scaled_pixmap = self.current_pixmap.scaled(self.image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.image_label.setPixmap(scaled_pixmap)
         super().resizeEvent(event)
+        self.update_pixel_ratio()
+        size = QSize(self.image_label.size())
+        self.fetch_engine.target_size = size
+        entry = self.current_entry
+        if entry is None or self.waiting_for_fetch:
+            return
+        pixmap = self.cached_pixmap(entry, size)
+        if pixmap is not None:
+            self.resize_timer.stop()
+            self.show_pixmap(pixmap)
+            return
+        # 第一遍：拖动过程中用现有的 pixmap 做快速低质量缩放
+        if entry.pixmap is not None:
+            ratio = self.decoder.pixel_ratio
+            pixmap = entry.pixmap.scaled(size * ratio, Qt.KeepAspectRatio, Qt.FastTransformation)
+            pixmap.setDevicePixelRatio(ratio)
+            self.image_label.setPixmap(pixmap)
+        self.resize_timer.start()
+
+    def finish_resize(self):
+        # 第二遍：尺寸稳定后在解码线程池中做平滑缩放
+        entry = self.current_entry
+        if entry is None or self.waiting_for_fetch:
+            return
+        size = QSize(self.image_label.size())
+        if self.cached_pixmap(entry, size) is None:
+            self.request_decode(entry, size)
+        self.update_memory_tiers()
+
+    def open_performance_dialog(self):
+        PerformanceDialog(self).exec_()
+
+    def memory_usage(self):
+        # 返回 (总字节数, 解码结果的字节数, 解码结果的数量)。条目和缩放结果缓存共用的 pixmap 只算一次
+        entries = list(self.history) + list(self.image_cache)
+        pixmaps = {entry.pixmap.cacheKey(): entry.pixmap for entry in entries if entry.pixmap is not None}
+        for pixmap in self.scaled_cache.items.values():
+            pixmaps[pixmap.cacheKey()] = pixmap
+        decoded = sum(pixmap_bytes(pixmap) for pixmap in pixmaps.values())
+        return sum(entry.data_bytes() for entry in entries) + decoded, decoded, len(pixmaps)
 
     def open_settings_dialog(self):
         dialog = SettingsDialog(self)
         if dialog.exec_():
-            old_api_url = self.api_url
+            old_urls = [url for url, _ in self.sources]
             old_max_cache = self.max_cache_size
             old_theme = self.current_theme
 
             self.load_settings()
+            self.store.max_bytes = self.store_size_mb * 1024 * 1024
+            # 先按新的上限裁剪历史并写回索引，裁掉的图片才能被淘汰
+            self.history_changed()
+            self.persist_state()
+            self.store.evict()
+            self.update_memory_tiers()
+            self.fetch_engine.skip_duplicates = self.skip_duplicates
+            self.fetch_engine.hedging = self.hedge_requests
+            # 只改权重时保留缓存，图片源本身变化才重新获取
+            self.fetch_engine.set_sources(self.sources)
+            self.metrics.enabled = self.metrics_enabled
+            self.prefetch.min_depth = self.min_cache_size
+            self.prefetch.max_depth = self.max_cache_size
+            if self.slideshow_active:
+                self.prefetch.slideshow_interval = self.slideshow_interval
 
             if self.current_theme != old_theme:
                 self.apply_theme()
 
-            if self.api_url != old_api_url or self.max_cache_size != old_max_cache:
+            if [url for url, _ in self.sources] != old_urls or self.max_cache_size != old_max_cache:
                 self.statusBar().showMessage(f"设置已更新，正在重新初始化缓存... | {KEYBOARD_SHORTCUTS_TIP}")
-                for fetcher in list(self.fetchers):
-                    if fetcher.isRunning():
-                        fetcher.requestInterruption()
-                        fetcher.wait(1000)
-                self.fetchers.clear()
+                self.fetch_engine.cancel_all()
                 self.image_cache.clear()
-                self.current_pixmap = None
-                self.current_image_data = None
-                self.current_image_url = None
+                self.current_entry = None
+                self.store.save_list("cache", self.image_cache)
                 self.download_button.setEnabled(False)
                 self.copy_button.setEnabled(False)
-                self.start_loading_animation()
+                self.wait_for_image()
                 self.fill_cache()
             QMessageBox.information(self, "设置", "设置已保存。")
             # 恢复状态栏的通用提示
-            self.statusBar().showMessage(f"设置已保存。缓存: {len(self.image_cache)}/{self.max_cache_size} | {KEYBOARD_SHORTCUTS_TIP}")
+            self.statusBar().showMessage(f"设置已保存。{self.cache_status()} | {KEYBOARD_SHORTCUTS_TIP}")
 
 
     def apply_theme(self):
@@ -481,7 +3043,7 @@ class acyViewer(QMainWindow):
                 QToolTip { color: #E0E0E0; background-color: #5A5A5A; border: 1px solid #6A6A6A; border-radius: 3px; padding: 4px; }
                 SettingsDialog { background-color: #2D2D2D; }
                 SettingsDialog QLabel { color: #E0E0E0; padding-top: 4px; }
-                SettingsDialog QLineEdit, SettingsDialog QSpinBox, SettingsDialog QComboBox {
+                SettingsDialog QLineEdit, SettingsDialog QSpinBox, SettingsDialog QComboBox, SettingsDialog QPlainTextEdit {
                     background-color: #3A3A3A; color: #E0E0E0; border: 1px solid #5A5A5A;
                     border-radius: 3px; padding: 5px; min-height: 22px;
                 }
@@ -502,15 +3064,249 @@ class acyViewer(QMainWindow):
             QApplication.instance().setStyleSheet("")
 
     def closeEvent(self, event):
-        for fetcher in self.fetchers:
-            if fetcher.isRunning():
-                fetcher.requestInterruption()
-                fetcher.wait(1500)
+        self.slideshow_timer.stop()
+        self.fetch_engine.shutdown()
+        self.decoder.shutdown()
+        self.thumbnails.shutdown()
+        self.saver.shutdown()
+        self.persist_state()
+        self.store.close()
+        self.duplicates.close()
         super().closeEvent(event)
 
-if __name__ == '__main__':
-    app = QApplication(sys.argv)
+# --- 无界面批量下载 ---
+# acyViewer.py --headless --count 5000 --out DIR --concurrency 16 [--rps 5]
+# 不创建窗口，复用 download_image / image_filename。每张图片写入后追加到
+# 输出目录下的 manifest.jsonl，中断后重新运行会从清单继续，并跳过目录中已有的内容。
+# 出错和连续重复按 FetchScheduler 退避；连续 --max-failures 次没有保存新图片
+# （API 一直出错，或图库里已经没有新图片）时停止，返回非零退出码。
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.next_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(self.next_time, now) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
 
-    viewer = acyViewer()
+class HeadlessDownloader:
+    def __init__(self, api_url, out_dir, count, concurrency, rps=0, max_failures=HEADLESS_MAX_FAILURES):
+        self.api_url = api_url
+        self.out_dir = out_dir
+        self.count = count
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = RateLimiter(rps)
+        self.manifest_path = os.path.join(out_dir, "manifest.jsonl")
+        self.session = create_session(self.concurrency * RANGED_DOWNLOAD_PARTS)
+        self.digests = set()
+        self.names = set()
+        self.completed = 0
+        self.in_flight = 0
+        self.downloaded = 0
+        self.bytes = 0
+        self.duplicates = 0
+        self.errors = collections.Counter()
+        # 批量下载等不起图形界面那样长的重复退避，上限缩短到 30 秒
+        self.scheduler = FetchScheduler(policies=dict(RETRY_POLICIES, duplicate=(1.0, 30.0)))
+        self.max_failures = max_failures
+        self.failures_in_row = 0
+        self.gave_up = False
+        self.stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def load_existing(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        manifest_files = set()
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 上次中断时可能只写了半行
+                        continue
+                    if os.path.exists(os.path.join(self.out_dir, record["file"])):
+                        self.digests.add(record["digest"])
+                        manifest_files.add(record["file"])
+        self.completed = len(self.digests)
+        # 目录中不在清单里的图片也按内容哈希记下来，避免重复下载
+        for name in os.listdir(self.out_dir):
+            self.names.add(name)
+            path = os.path.join(self.out_dir, name)
+            if name in manifest_files or not os.path.isfile(path):
+                continue
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                with open(path, 'rb') as f:
+                    self.digests.add(ImageStore.digest_of(f.read()))
+
+    def worker(self):
+        while not self.stop.is_set():
+            # 按“已完成 + 进行中”预留名额，避免最后几张被多个线程同时下载
+            with self._lock:
+                if self.completed + self.in_flight >= self.count:
+                    return
+                # 退避中，或熔断后已有一个线程在探测
+                allowed = self.scheduler.allowed(1)
+                wait = self.scheduler.wait_time()
+                if allowed:
+                    self.in_flight += 1
+            if not allowed:
+                self.stop.wait(max(wait, 0.1))
+                continue
+            try:
+                self.rate_limiter.wait()
+                self.download_one()
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+    def failed(self):
+        # 调用时持有 self._lock
+        self.failures_in_row += 1
+        if self.failures_in_row >= self.max_failures and not self.gave_up:
+            self.gave_up = True
+            self.stop.set()
+
+    def download_one(self):
+        started = self.scheduler.clock()
+        try:
+            result = download_image(self.session, self.api_url, self.stop.is_set)
+        except Exception as e:
+            kind = fetch_error_kind(e)
+            with self._lock:
+                self.errors[kind] += 1
+                self.scheduler.record_failure(kind, started, retry_after_seconds(e))
+                self.failed()
+            return
+        if result is None:
+            with self._lock:
+                # 被中断的熔断探测不会有结果，归还名额
+                self.scheduler.probe_in_flight = False
+            return
+        image_data, image_url = result
+        if not image_data or sniff_image_extension(image_data) is None:
+            with self._lock:
+                self.errors["invalid"] += 1
+                self.scheduler.record_failure("invalid", started)
+                self.failed()
+            return
+        self.save(image_data, image_url)
+
+    def save(self, image_data, image_url):
+        digest = ImageStore.digest_of(image_data)
+        with self._lock:
+            self.downloaded += 1
+            self.bytes += len(image_data)
+            if digest in self.digests or self.completed >= self.count:
+                if digest in self.digests:
+                    self.duplicates += 1
+                    self.scheduler.record_duplicate()
+                    self.failed()
+                return
+            self.digests.add(digest)
+            name = image_filename(image_url, image_data)
+            if name in self.names:
+                name = digest[:16] + os.path.splitext(name)[1]
+            self.names.add(name)
+        path = os.path.join(self.out_dir, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(image_data)
+            os.replace(tmp_path, path)
+        except OSError:
+            # 磁盘写满、权限不足等：记为错误并让出名额，这张图片之后可以重新下载
+            with self._lock:
+                self.errors["write"] += 1
+                self.digests.discard(digest)
+                self.names.discard(name)
+                self.scheduler.record_success()
+                self.failed()
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            self.stop.wait(1.0)
+            return
+        record = json.dumps({"digest": digest, "file": name, "url": image_url, "bytes": len(image_data)}, ensure_ascii=False)
+        with self._lock:
+            try:
+                with open(self.manifest_path, 'a', encoding="utf-8") as f:
+                    f.write(record + "\n")
+            except OSError:
+                # 图片本身已经保存，下次运行时会按内容哈希识别出来
+                self.errors["write"] += 1
+            self.completed += 1
+            self.failures_in_row = 0
+            self.scheduler.record_success()
+
+    def run(self):
+        self.load_existing()
+        already = self.completed
+        print(f"输出目录: {self.out_dir}，已有 {already} 张，目标 {self.count} 张，并发 {self.concurrency}")
+        start = time.monotonic()
+        threads = [threading.Thread(target=self.worker, daemon=True) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            print("\n已中断，正在停止...")
+            self.stop.set()
+            for thread in threads:
+                thread.join(2)
+        elapsed = max(time.monotonic() - start, 1e-6)
+        self.session.close()
+
+        saved = self.completed - already
+        print(f"完成: 新保存 {saved} 张，共 {self.completed}/{self.count} 张，用时 {elapsed:.1f} s")
+        print(f"吞吐: {saved / elapsed:.2f} 张/s，{self.bytes / elapsed / 1024 / 1024:.2f} MB/s "
+              f"（下载 {self.downloaded} 张，{self.bytes / 1024 / 1024:.1f} MB）")
+        print(f"重复跳过: {self.duplicates}，错误: {sum(self.errors.values())}" +
+              ("".join(f"，{kind}={n}" for kind, n in sorted(self.errors.items()))))
+        if self.gave_up:
+            print(f"连续 {self.failures_in_row} 次没有保存新图片（出错或重复），已停止。图库中可能没有更多新图片，或 API 持续出错")
+        return 0 if self.completed >= self.count else 1
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="acy.moe 图片查看器")
+    parser.add_argument("--headless", action="store_true", help="不显示窗口，批量下载图片")
+    parser.add_argument("--count", type=int, default=100, help="输出目录中的目标图片数量")
+    parser.add_argument("--out", default=".", help="批量下载的输出目录")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_FETCH_WORKERS, help="并发下载数")
+    parser.add_argument("--rps", type=float, default=0, help="每秒最多请求数，0 表示不限制")
+    parser.add_argument("--max-failures", type=int, default=HEADLESS_MAX_FAILURES,
+                        help="批量下载时连续这么多次出错或重复后停止")
+    parser.add_argument("--api-url", default=None, help="批量下载使用的图片 API 地址，默认使用设置中的地址")
+    parser.add_argument("--profile-startup", action="store_true", help="打印启动各阶段的耗时")
+    return parser.parse_known_args(argv)
+
+
+if __name__ == '__main__':
+    args, qt_args = parse_args(sys.argv[1:])
+    if args.headless:
+        api_url = args.api_url or QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION).value("api_url", DEFAULT_API_URL)
+        sys.exit(HeadlessDownloader(api_url, args.out, args.count, args.concurrency, args.rps,
+                                    args.max_failures).run())
+
+    profiler = StartupProfiler(args.profile_startup)
+    profiler.mark("导入模块")
+    app = QApplication(sys.argv[:1] + qt_args)
+    qInstallMessageHandler(quiet_partial_decode_warnings)
+    profiler.mark("创建 QApplication")
+
+    viewer = acyViewer(profiler)
     viewer.show()
+    profiler.mark("显示窗口")
     sys.exit(app.exec_())
\ No newline at end of file
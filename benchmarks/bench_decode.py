@@ -0,0 +1,105 @@
+# 按显示尺寸解码的测试
+# 对超大图片比较两种解码方式：完整解码后再平滑缩放（原来的做法），以及 decode_image
+# 用 QImageReader 直接按显示尺寸解码。每种方式在独立的子进程中运行，统计解码耗时、
+# 解码过程中进程峰值内存的增量，以及缩放结果（即每张缓存图片）占用的内存。
+#
+# 用法: python benchmarks/bench_decode.py [--app DIR] [--size 7680x4320 --size 10240x5760] [--display 1600x900] [--ratio 1 --ratio 2]
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_api import make_image, parse_size
+
+
+def peak_rss_bytes():
+    # Linux 上用 VmHWM：子进程的 ru_maxrss 会继承 fork 时父进程的峰值
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def child(args):
+    from PyQt5.QtGui import QImage
+    from PyQt5.QtCore import QSize, Qt
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+    sys.path.insert(0, os.path.abspath(args.app))
+    import acyViewer
+
+    with open(args.file, "rb") as f:
+        data = f.read()
+    display = QSize(*parse_size(args.display))
+    ratio = args.ratio[0]
+    before = peak_rss_bytes()
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        if args.mode == "full":
+            image = QImage.fromData(data)
+            target = QSize(round(display.width() * ratio), round(display.height() * ratio))
+            image = image.scaled(target, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        else:
+            image = acyViewer.decode_image(data, display, pixel_ratio=ratio)
+        times.append(time.perf_counter() - start)
+        result_bytes = image.sizeInBytes()
+        del image
+    print(json.dumps({"ms": sorted(times)[len(times) // 2] * 1000, "peak_mb": (peak_rss_bytes() - before) / 1024 / 1024,
+                      "result_mb": result_bytes / 1024 / 1024}))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按显示尺寸解码的测试")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+                        help="acyViewer.py 所在目录")
+    parser.add_argument("--size", action="append", default=None, help="图片尺寸，可重复，默认 7680x4320 和 10240x5760")
+    parser.add_argument("--format", default="jpg", help="图片格式 jpg/png/bmp")
+    parser.add_argument("--display", default="1600x900", help="显示区域的尺寸（逻辑像素）")
+    parser.add_argument("--ratio", action="append", type=float, default=None, help="设备像素比，可重复，默认 1 和 2")
+    parser.add_argument("--repeat", type=int, default=3, help="每种方式解码的次数，取中位数")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    print(f"显示区域 {args.display}，每种方式解码 {args.repeat} 次取中位数\n")
+    print(f"{'图片':<22}{'像素比':>6}  {'方式':<14}{'解码耗时':>10}{'峰值内存增量':>14}{'缓存每张':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.size or ["7680x4320", "10240x5760"]:
+            width, height = parse_size(size)
+            path = os.path.join(directory, f"{size}.{args.format}")
+            data = make_image(width, height, args.format, seed=width)
+            with open(path, "wb") as f:
+                f.write(data)
+            label = f"{size} {args.format} {len(data) / 1024 / 1024:.1f} MB"
+            for ratio in args.ratio or [1.0, 2.0]:
+                for mode, name in (("full", "完整解码再缩放"), ("reduced", "按显示尺寸解码")):
+                    output = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "--child", "--mode", mode, "--file", path,
+                         "--app", args.app, "--display", args.display, "--ratio", str(ratio), "--repeat", str(args.repeat)],
+                        capture_output=True, text=True, check=True).stdout
+                    result = json.loads(output.strip().splitlines()[-1])
+                    print(f"{label:<22}{ratio:>6g}  {name:<10}{result['ms']:>10.0f} ms{result['peak_mb']:>10.0f} MB"
+                          f"{result['result_mb']:>8.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
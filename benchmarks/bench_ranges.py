@@ -0,0 +1,65 @@
+# 分段并行下载的吞吐量测试
+# 模拟 API 按连接限速，分别在支持与不支持 Range 的情况下用 download_image 下载大图片，
+# 检查数据完整，并输出每张图片的平均耗时和吞吐量。
+#
+# 用法: python benchmarks/bench_ranges.py [--app DIR] [--size 2400x1600] [--format bmp] [--bandwidth 2000000] [--images 3]
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_api import FakeImageAPI, parse_size
+
+
+def run(module, api, images):
+    session = module.create_session(module.DEFAULT_FETCH_WORKERS * module.RANGED_DOWNLOAD_PARTS)
+    known = {data for data, _ in api.images}
+    elapsed = []
+    nbytes = 0
+    requests_before = api.requests
+    connections_before = api.connections
+    for _ in range(images):
+        start = time.perf_counter()
+        data, url = module.download_image(session, api.url)
+        elapsed.append(time.perf_counter() - start)
+        if data not in known:
+            raise SystemExit(f"下载的数据与原图不一致: {url}")
+        nbytes += len(data)
+    session.close()
+    total = sum(elapsed)
+    return total / images, nbytes / total / 1024 / 1024, api.connections - connections_before, api.requests - requests_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分段并行下载吞吐量测试")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+                        help="acyViewer.py 所在目录")
+    parser.add_argument("--size", default="2400x1600", help="图片尺寸")
+    parser.add_argument("--format", default="bmp", help="图片格式；生成的 JPEG 压缩率很高，默认用 BMP 得到足够大的文件")
+    parser.add_argument("--bandwidth", type=int, default=2000000, help="每个连接的带宽上限（字节/秒）")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--images", type=int, default=3, help="每种配置下载的图片数")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(args.app))
+    import acyViewer
+
+    size = parse_size(args.size)
+    api = FakeImageAPI([size], [args.format], count=3, latency=args.latency, bandwidth=args.bandwidth).start()
+    sizes = sorted(len(data) for data, _ in api.images)
+    print(f"图片 {args.size} {args.format}，{sizes[0] / 1024 / 1024:.1f}-{sizes[-1] / 1024 / 1024:.1f} MB，"
+          f"每个连接限速 {args.bandwidth / 1024 / 1024:.1f} MB/s\n")
+    for label, ranges in (("单连接（服务器不支持 Range）", False), ("分段并行下载", True)):
+        api.ranges = ranges
+        mean, throughput, connections, requests = run(acyViewer, api, args.images)
+        print(f"{label}:")
+        print(f"  平均每张 {mean * 1000:7.0f} ms，吞吐量 {throughput:5.2f} MB/s，新建连接 {connections} 个，API 请求 {requests} 次")
+    api.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
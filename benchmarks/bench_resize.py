@@ -0,0 +1,154 @@
+# 窗口缩放风暴的微基准测试
+# 用本地 HTTP 服务提供一张大图，离屏驱动 acyViewer 连续改变窗口尺寸，
+# 统计每帧耗时、停止拖动后变清晰的耗时，以及最大化/还原切换的耗时。
+#
+# 用法: QT_QPA_PLATFORM=offscreen python benchmarks/bench_resize.py [--app DIR] [--width 6000 --height 4000]
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QImage, QColor, QPainter, QLinearGradient
+from PyQt5.QtCore import QStandardPaths, QBuffer, QByteArray
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_api import isolated_settings
+
+# 两次切换之间的间隔，需大于 acyViewer 的缩放防抖时间
+RESIZE_SETTLE_SECONDS = 0.3
+
+
+def make_image(width, height):
+    image = QImage(width, height, QImage.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, width, height)
+    gradient.setColorAt(0, QColor(30, 60, 200))
+    gradient.setColorAt(1, QColor(220, 120, 20))
+    painter.fillRect(image.rect(), gradient)
+    painter.end()
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QBuffer.WriteOnly)
+    image.save(buffer, "JPG", 90)
+    return bytes(data)
+
+
+def serve_image(data):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/image.jpg"
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="acyViewer 窗口缩放基准测试")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+                        help="acyViewer.py 所在目录，可用于对比其他版本")
+    parser.add_argument("--width", type=int, default=6000)
+    parser.add_argument("--height", type=int, default=4000)
+    parser.add_argument("--steps", type=int, default=120, help="一次缩放风暴中的尺寸变化次数")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    QStandardPaths.setTestModeEnabled(True)
+    sys.path.insert(0, os.path.abspath(args.app))
+    import acyViewer
+
+    store_dir = acyViewer.default_store_dir()
+    shutil.rmtree(store_dir, ignore_errors=True)
+    settings = isolated_settings(acyViewer)
+    settings.setValue("api_url", serve_image(make_image(args.width, args.height)))
+    settings.setValue("max_cache_size", 1)
+
+    def pump(seconds):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            app.processEvents()
+            time.sleep(0.001)
+
+    def is_sharp():
+        entry = getattr(viewer, "current_entry", None)
+        if entry is None:
+            return True
+        return entry.pixmap_size == viewer.image_label.size()
+
+    def wait_sharp(timeout=10):
+        start = time.perf_counter()
+        while not is_sharp() and time.perf_counter() - start < timeout:
+            app.processEvents()
+            time.sleep(0.0005)
+        return time.perf_counter() - start
+
+    viewer = acyViewer.acyViewer()
+    viewer.resize(900, 700)
+    viewer.show()
+    start = time.perf_counter()
+    while viewer.image_label.pixmap() is None and time.perf_counter() - start < 30:
+        pump(0.01)
+    pump(0.5)
+    wait_sharp()
+
+    frame_times = []
+    settle_times = []
+    for _ in range(args.rounds):
+        for step in range(args.steps):
+            width = 900 + (step * 7) % 500
+            height = 700 + (step * 5) % 300
+            t0 = time.perf_counter()
+            viewer.resize(width, height)
+            app.processEvents()
+            frame_times.append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        pump(0.001)
+        settle_times.append((time.perf_counter() - t0 + wait_sharp()) * 1000)
+
+    toggle_times = []
+    for _ in range(args.rounds * 2):
+        for width, height in ((1400, 1000), (900, 700)):
+            t0 = time.perf_counter()
+            viewer.resize(width, height)
+            app.processEvents()
+            wait_sharp()
+            toggle_times.append((time.perf_counter() - t0) * 1000)
+            pump(RESIZE_SETTLE_SECONDS)
+
+    viewer.close()
+    pump(0.2)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    settings.clear()
+
+    print(f"图片尺寸: {args.width}x{args.height}, 缩放帧数: {len(frame_times)}")
+    print(f"拖动中每帧耗时 (ms): p50={percentile(frame_times, 50):.2f} p95={percentile(frame_times, 95):.2f} "
+          f"max={max(frame_times):.2f} mean={statistics.mean(frame_times):.2f}")
+    print(f"停止拖动到清晰 (ms): mean={statistics.mean(settle_times):.1f} max={max(settle_times):.1f}")
+    print(f"最大化/还原切换到清晰 (ms): p50={percentile(toggle_times, 50):.2f} max={max(toggle_times):.2f}")
+
+
+if __name__ == '__main__':
+    main()
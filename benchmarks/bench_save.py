@@ -0,0 +1,97 @@
+# 批量保存的测试
+# 把一批图片放进临时的磁盘存储，分别用逐个 fsync 的同步写法和 SaveQueue 的批量 fsync 导出到空目录，
+# 再向同一目录重复导出一次（内容都已存在，应全部跳过），输出各自的耗时。
+#
+# 用法: python benchmarks/bench_save.py [--app DIR] [--images 200] [--size 1200x800] [--dir 临时目录的父目录]
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QCoreApplication
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_api import make_image, parse_size
+
+
+def export_sync(store, digests, out_dir):
+    # 改动前的写法：每张图片写完立即 fsync 文件和目录
+    for digest in digests:
+        path = os.path.join(out_dir, digest[:16] + ".jpg")
+        tmp_path = path + ".tmp"
+        store.export(digest, tmp_path)
+        with open(tmp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        fd = os.open(out_dir, os.O_RDONLY)
+        os.fsync(fd)
+        os.close(fd)
+
+
+def export_queue(app, saver, entries, out_dir):
+    job = saver.export(entries, out_dir)
+    finished = []
+    saver.export_finished.connect(finished.append)
+    while job not in finished:
+        app.processEvents()
+        time.sleep(0.001)
+    saver.export_finished.disconnect(finished.append)
+    return job
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量保存测试")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+                        help="acyViewer.py 所在目录")
+    parser.add_argument("--images", type=int, default=200, help="导出的图片数")
+    parser.add_argument("--size", default="1200x800", help="图片尺寸")
+    parser.add_argument("--dir", default=None, help="在该目录下创建临时目录，用于测试不同的磁盘")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv[:1])
+    sys.path.insert(0, os.path.abspath(args.app))
+    import acyViewer
+
+    root = tempfile.mkdtemp(dir=args.dir)
+    try:
+        store = acyViewer.ImageStore(os.path.join(root, "store"), 1 << 40)
+        width, height = parse_size(args.size)
+        entries = []
+        for i in range(args.images):
+            data = make_image(width, height, "jpg", seed=i)
+            entries.append((store.put(data), f"http://example.com/images/{i}.jpg", None))
+        nbytes = sum(os.path.getsize(store.path(digest)) for digest, _, _ in entries)
+        print(f"{args.images} 张 {args.size} JPEG，共 {nbytes / 1024 / 1024:.1f} MB\n")
+
+        # 存储和导出目录在同一文件系统上时两种写法都是硬链接，比较的是 fsync 的次数
+        out_dir = os.path.join(root, "sync")
+        os.makedirs(out_dir)
+        start = time.perf_counter()
+        export_sync(store, [digest for digest, _, _ in entries], out_dir)
+        sync_time = time.perf_counter() - start
+        print(f"逐个 fsync:       {sync_time * 1000:8.0f} ms，{args.images / sync_time:7.1f} 张/s")
+
+        saver = acyViewer.SaveQueue(store)
+        out_dir = os.path.join(root, "queue")
+        start = time.perf_counter()
+        job = export_queue(app, saver, entries, out_dir)
+        queue_time = time.perf_counter() - start
+        print(f"SaveQueue 批量:   {queue_time * 1000:8.0f} ms，{args.images / queue_time:7.1f} 张/s"
+              f"（写入 {job.written}，失败 {job.failed}）")
+
+        start = time.perf_counter()
+        job = export_queue(app, saver, entries, out_dir)
+        print(f"重复导出（跳过）: {(time.perf_counter() - start) * 1000:8.0f} ms（跳过 {job.skipped}，写入 {job.written}）")
+        saver.shutdown()
+        store.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# 多图片源的吞吐量测试
+# 启动两个模拟 API，持续保持固定数量的预取任务，先正常运行一段时间，再让其中一个源变慢或出错，
+# 分别统计两个阶段每秒获取的图片数和获取耗时。对比只用一个源、两个源、两个源加对冲请求三种配置。
+#
+# 用法: python benchmarks/bench_sources.py [--app DIR] [--healthy 10] [--degraded 20] [--slow-latency 2.0]
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_api import FakeImageAPI
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def run(app, module, urls, hedging, args, fast, slow):
+    engine = module.FetchEngine([(url, 1.0) for url in urls], workers=args.workers)
+    engine.skip_duplicates = False
+    engine.hedging = hedging
+    completions = []
+    engine.image_fetched.connect(lambda entry: completions.append(time.monotonic()))
+    engine.fetch_completed.connect(lambda elapsed, nbytes, decode: latencies.append((time.monotonic(), elapsed)))
+    latencies = []
+    engine.start()
+    slow.latency = fast.latency = args.latency
+    slow.error_rate = 0.0
+    start = time.monotonic()
+    degraded_at = start + args.healthy
+    end = degraded_at + args.degraded
+    degraded = False
+    while time.monotonic() < end:
+        if not degraded and time.monotonic() >= degraded_at:
+            # 第二阶段：slow 变慢并偶尔出错
+            slow.latency = args.slow_latency
+            slow.error_rate = args.slow_errors
+            degraded = True
+        # 与 acyViewer.fill_cache 一样保持固定数量的任务在进行
+        needed = args.depth - engine.pending()
+        if needed > 0:
+            engine.submit(needed)
+        app.processEvents()
+        time.sleep(0.002)
+    engine.shutdown()
+
+    def phase(lo, hi):
+        count = sum(1 for t in completions if lo <= t < hi)
+        values = [elapsed for t, elapsed in latencies if lo <= t < hi]
+        p50, p95 = percentile(values, 50), percentile(values, 95)
+        return (f"{count / (hi - lo):5.2f} 张/秒, p50 {p50 * 1000 if p50 else 0:6.0f} ms, "
+                f"p95 {p95 * 1000 if p95 else 0:6.0f} ms")
+
+    return phase(start, degraded_at), phase(degraded_at, end), engine.hedges_sent, engine.hedges_won
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多图片源吞吐量测试")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+                        help="acyViewer.py 所在目录")
+    parser.add_argument("--healthy", type=float, default=10.0, help="正常阶段的秒数")
+    parser.add_argument("--degraded", type=float, default=20.0, help="一个源变慢后的秒数")
+    parser.add_argument("--latency", type=float, default=0.1, help="正常时每个请求的延迟（秒）")
+    parser.add_argument("--slow-latency", type=float, default=2.0, help="变慢后的延迟（秒）")
+    parser.add_argument("--slow-errors", type=float, default=0.2, help="变慢后的错误率")
+    parser.add_argument("--workers", type=int, default=6)
+    parser.add_argument("--depth", type=int, default=4, help="保持进行中的任务数")
+    parser.add_argument("--size", default="1600x1200")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    sys.path.insert(0, os.path.abspath(args.app))
+    import acyViewer
+
+    width, height = (int(value) for value in args.size.split("x"))
+    fast = FakeImageAPI([(width, height)], count=20, seed=1).start()
+    slow = FakeImageAPI([(width, height)], count=20, seed=2).start()
+    configs = [
+        ("只用变慢的源", [slow.url], False),
+        ("两个源", [slow.url, fast.url], False),
+        ("两个源 + 对冲", [slow.url, fast.url], True),
+    ]
+    print(f"正常 {args.healthy:.0f} 秒，之后一个源延迟 {args.slow_latency} 秒、错误率 {args.slow_errors:.0%}，"
+          f"持续 {args.degraded:.0f} 秒\n")
+    for label, urls, hedging in configs:
+        healthy, degraded, sent, won = run(app, acyViewer, urls, hedging, args, fast, slow)
+        print(f"{label}:")
+        print(f"  正常阶段  {healthy}")
+        print(f"  变慢之后  {degraded}")
+        if hedging:
+            print(f"  对冲请求 {sent} 次，胜出 {won} 次")
+    fast.stop()
+    slow.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
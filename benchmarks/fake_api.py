@@ -0,0 +1,247 @@
+# 本地模拟的图片 API，用于基准测试，不需要访问 acy.moe
+# /api/r18 以 302 重定向到一张随机图片 /images/<编号>.<格式>，与真实 API 的行为一致。
+# 可以设置图片尺寸和格式，并注入延迟、带宽限制和错误率。图片请求支持 Range。
+#
+# 单独运行: python benchmarks/fake_api.py --port 8000 --size 3000x2000 --latency 0.05 --bandwidth 2000000
+import argparse
+import atexit
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtGui import QImage, QColor, QPainter, QLinearGradient
+from PyQt5.QtCore import QBuffer, QByteArray, QSettings
+
+CONTENT_TYPES = {"jpg": "image/jpeg", "png": "image/png", "bmp": "image/bmp"}
+# Qt 没有 GIF 编码器，只能生成这几种格式
+QT_FORMATS = {"jpg": "JPG", "png": "PNG", "bmp": "BMP"}
+
+
+def make_image(width, height, fmt="jpg", seed=0, quality=90):
+    # 随机色块叠加渐变，保证每张图片内容不同，感知哈希也不相近
+    rng = random.Random(seed)
+    image = QImage(width, height, QImage.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, rng.randint(1, width), rng.randint(1, height))
+    gradient.setColorAt(0, QColor(rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+    gradient.setColorAt(1, QColor(rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+    painter.fillRect(image.rect(), gradient)
+    for _ in range(16):
+        color = QColor(rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+        painter.fillRect(rng.randrange(width), rng.randrange(height),
+                         rng.randint(width // 20 + 1, width // 2 + 1), rng.randint(height // 20 + 1, height // 2 + 1), color)
+    painter.end()
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QBuffer.WriteOnly)
+    image.save(buffer, QT_FORMATS[fmt], quality)
+    return bytes(data)
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def isolated_settings(acy):
+    # 让被测的 acyViewer 把设置写到单独的位置，测试脚本清空设置时不会动到真实设置。
+    # QSettings(组织名, 应用名) 在 Windows 和 macOS 上总是写注册表和 plist，setPath 只对
+    # Linux 等平台的文件格式有效，所以还要换一个应用名；不支持换名的旧版本只能在 Linux 上测。
+    path = tempfile.mkdtemp(prefix="acyViewer-settings-")
+    atexit.register(shutil.rmtree, path, True)
+    for fmt in (QSettings.NativeFormat, QSettings.IniFormat):
+        QSettings.setPath(fmt, QSettings.UserScope, path)
+    if hasattr(acy, "SETTINGS_APPLICATION"):
+        acy.SETTINGS_APPLICATION += "-bench"
+    elif sys.platform in ("win32", "darwin"):
+        sys.exit("该版本的 acyViewer 不支持单独的设置，运行测试会改动真实设置，已退出")
+    settings = QSettings(getattr(acy, "SETTINGS_ORGANIZATION", "MyCompany"),
+                         getattr(acy, "SETTINGS_APPLICATION", "acyViewer"))
+    settings.clear()
+    return settings
+
+
+class FakeImageAPI:
+    def __init__(self, sizes=((1920, 1080),), formats=("jpg",), count=40, latency=0.0, jitter=0.0,
+                 bandwidth=0, error_rate=0.0, ranges=True, host="127.0.0.1", port=0, seed=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.ranges = ranges
+        self.random = random.Random(seed)
+        self.images = []
+        for i in range(count):
+            width, height = sizes[i % len(sizes)]
+            fmt = formats[i % len(formats)]
+            self.images.append((make_image(width, height, fmt, seed * 100003 + i), fmt))
+        # 按顺序返回的状态码脚本，例如 [503, 503, 429]；用完后按 error_rate 随机出错
+        self.script = []
+        self.retry_after = None
+        self.connections = 0
+        self.requests = 0
+        self.bytes_sent = 0
+        # 每个 API 请求的 (time.monotonic(), 状态码)
+        self.log = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/r18"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def next_status(self):
+        with self._lock:
+            self.requests += 1
+            if self.script:
+                status = self.script.pop(0)
+            elif self.error_rate and self.random.random() < self.error_rate:
+                status = 500
+            else:
+                status = 200
+            self.log.append((time.monotonic(), status))
+            return status
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with api._lock:
+                    api.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def handle_one_request(self):
+                try:
+                    super().handle_one_request()
+                except (ConnectionError, BrokenPipeError):
+                    self.close_connection = True
+
+            def send_error_status(self, status):
+                body = f"error {status}".encode()
+                self.send_response(status)
+                if status in (429, 503) and api.retry_after is not None:
+                    self.send_header("Retry-After", str(api.retry_after))
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def wait_latency(self):
+                delay = api.latency + (api.random.uniform(0, api.jitter) if api.jitter else 0)
+                if delay > 0:
+                    time.sleep(delay)
+
+            def do_HEAD(self):
+                self.do_GET(head=True)
+
+            def do_GET(self, head=False):
+                self.wait_latency()
+                if self.path.startswith("/api/"):
+                    status = api.next_status()
+                    if status != 200:
+                        self.send_error_status(status)
+                        return
+                    index = api.random.randrange(len(api.images))
+                    self.send_response(302)
+                    self.send_header("Location", f"/images/{index}.{api.images[index][1]}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                match = re.match(r"/images/(\d+)\.(\w+)$", self.path)
+                if not match or int(match.group(1)) >= len(api.images):
+                    self.send_error_status(404)
+                    return
+                data, fmt = api.images[int(match.group(1))]
+                start, end = 0, len(data) - 1
+                range_header = self.headers.get("Range")
+                range_match = re.match(r"bytes=(\d*)-(\d*)$", range_header or "")
+                if api.ranges and range_match and (range_match.group(1) or range_match.group(2)):
+                    if range_match.group(1):
+                        start = int(range_match.group(1))
+                        end = min(int(range_match.group(2)), end) if range_match.group(2) else end
+                    else:
+                        start = max(len(data) - int(range_match.group(2)), 0)
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPES[fmt])
+                self.send_header("Content-Length", str(end - start + 1))
+                if api.ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+                self.end_headers()
+                if not head:
+                    self.send_body(memoryview(data)[start:end + 1])
+
+            def send_body(self, body):
+                # 带宽限制按每个连接计算，分块发送并按需等待
+                chunk_size = 16384
+                started = time.monotonic()
+                sent = 0
+                while sent < len(body):
+                    chunk = body[sent:sent + chunk_size]
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+                    with api._lock:
+                        api.bytes_sent += len(chunk)
+                    if api.bandwidth:
+                        ahead = sent / api.bandwidth - (time.monotonic() - started)
+                        if ahead > 0:
+                            time.sleep(ahead)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟图片 API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--size", action="append", default=None, help="图片尺寸，如 1920x1080，可重复")
+    parser.add_argument("--format", action="append", default=None, choices=sorted(QT_FORMATS), help="图片格式，可重复")
+    parser.add_argument("--count", type=int, default=40, help="不同图片的数量")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外的随机延迟上限（秒）")
+    parser.add_argument("--bandwidth", type=int, default=0, help="每个连接的带宽上限（字节/秒），0 表示不限制")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="API 请求返回 500 的概率")
+    parser.add_argument("--no-ranges", action="store_true", help="不支持 Range 请求")
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in (args.size or ["1920x1080"])]
+    api = FakeImageAPI(sizes, args.format or ["jpg"], args.count, args.latency, args.jitter,
+                       args.bandwidth, args.error_rate, not args.no_ranges, args.host, args.port)
+    print(f"模拟 API: {api.url}", flush=True)
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# 重试与熔断的场景测试
+# 用 fake_api.py 按脚本返回失败状态码，离屏运行 acyViewer，记录每个 API 请求的时间，
+# 检查退避间隔、Retry-After、熔断后的探测频率以及故障结束后的恢复时间。
+#
+# 用法: python benchmarks/retry_scenarios.py [--app DIR] [--outage 30]
+import argparse
+import os
+import shutil
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QStandardPaths
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_api import FakeImageAPI, isolated_settings
+
+
+class Scenario:
+    def __init__(self, app, module, api):
+        self.app = app
+        self.module = module
+        self.api = api
+        self.states = []
+
+    def pump(self, seconds):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.002)
+
+    def start_viewer(self):
+        viewer = self.module.acyViewer()
+        engine = viewer.fetch_engine
+        if hasattr(engine, "breaker_changed"):
+            engine.breaker_changed.connect(lambda state: self.states.append((time.monotonic(), state)))
+        viewer.show()
+        return viewer
+
+    def requests_between(self, start, end):
+        return [(t, status) for t, status in self.api.log if start <= t < end]
+
+
+def gaps(entries):
+    # 并发的几个请求几乎同时发出，只统计相隔 50 毫秒以上的间隔
+    return [round(b[0] - a[0], 2) for a, b in zip(entries, entries[1:]) if b[0] - a[0] > 0.05]
+
+
+def run_scripted(scenario, statuses, retry_after, label):
+    api = scenario.api
+    api.script = list(statuses)
+    api.retry_after = retry_after
+    start = time.monotonic()
+    viewer = scenario.start_viewer()
+    # 等到脚本用完并拿到第一张图片
+    while time.monotonic() - start < 120 and (api.script or viewer.current_entry is None):
+        scenario.pump(0.05)
+    failed = [(t, s) for t, s in scenario.requests_between(start, time.monotonic()) if s != 200]
+    print(f"\n[{label}] 失败请求 {len(failed)} 个，失败之间的间隔(秒): {gaps(failed)}")
+    print(f"  首张图片用时 {time.monotonic() - start:.1f} 秒")
+    viewer.close()
+    scenario.pump(0.2)
+
+
+def run_outage(scenario, outage, label):
+    api = scenario.api
+    api.script = []
+    api.retry_after = None
+    viewer = scenario.start_viewer()
+    scenario.pump(2)
+    # 故障期间所有 API 请求都返回 500
+    api.error_rate = 1.0
+    viewer.image_cache.clear()
+    outage_start = time.monotonic()
+    viewer.fill_cache()
+    scenario.pump(outage)
+    api.error_rate = 0.0
+    outage_end = time.monotonic()
+    recovered = None
+    while time.monotonic() - outage_end < 180:
+        scenario.pump(0.05)
+        if viewer.image_cache:
+            recovered = time.monotonic() - outage_end
+            break
+    during = scenario.requests_between(outage_start, outage_end)
+    print(f"\n[{label}] 故障 {outage:.0f} 秒内共 {len(during)} 个 API 请求，"
+          f"最后几次请求的间隔(秒): {gaps(during)[-6:]}")
+    transitions = [(round(t - outage_start, 1), state) for t, state in scenario.states if t >= outage_start]
+    print(f"  熔断状态变化(相对故障开始的秒数): {transitions}")
+    print(f"  故障结束后恢复用时: {'%.1f 秒' % recovered if recovered is not None else '未恢复'}")
+    viewer.close()
+    scenario.pump(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重试与熔断的场景测试")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+                        help="acyViewer.py 所在目录")
+    parser.add_argument("--outage", type=float, default=30.0, help="模拟故障持续的秒数")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    QStandardPaths.setTestModeEnabled(True)
+    sys.path.insert(0, os.path.abspath(args.app))
+    import acyViewer
+
+    api = FakeImageAPI([(800, 600)], count=20).start()
+    settings = isolated_settings(acyViewer)
+    scenario = Scenario(app, acyViewer, api)
+    runs = [
+        lambda: run_scripted(scenario, [503] * 10, None, "连续 503"),
+        lambda: run_scripted(scenario, [429] * 6, 3, "429 + Retry-After: 3"),
+        lambda: run_outage(scenario, args.outage, "API 持续故障"),
+    ]
+    for run in runs:
+        shutil.rmtree(acyViewer.default_store_dir(), ignore_errors=True)
+        settings.clear()
+        settings.setValue("api_url", api.url)
+        settings.sync()
+        run()
+    api.stop()
+    shutil.rmtree(acyViewer.default_store_dir(), ignore_errors=True)
+    settings.clear()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,288 @@
+# acyViewer 基准测试
+# 启动本地模拟 API（fake_api.py），离屏驱动 acyViewer 走一遍脚本化的浏览过程，
+# 统计首个像素和首张完整图片的时间、下一张/上一张延迟、缓存未命中率、峰值内存和线程数。
+# 结果可以保存为基线，之后用 --compare 对比，超出容差的指标视为退化。
+#
+# 用法:
+#   python benchmarks/run_bench.py --save benchmarks/baseline.json
+#   python benchmarks/run_bench.py --compare benchmarks/baseline.json
+#   python benchmarks/run_bench.py --latency 0.2 --bandwidth 1000000 --error-rate 0.1 --size 4000x3000
+#   python benchmarks/run_bench.py --slideshow 0.5 --latency 0.3   # 幻灯片放映，统计错过的截止时间
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QStandardPaths
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_api import FakeImageAPI, isolated_settings, parse_size
+
+# 指标名 -> 数值越大越差时为 True
+METRICS = {
+    "first_pixel_ms": True,
+    "first_image_ms": True,
+    "next_p50_ms": True,
+    "next_p95_ms": True,
+    "previous_p50_ms": True,
+    "previous_p95_ms": True,
+    "cache_miss_rate": True,
+    "peak_rss_mb": True,
+    "peak_threads": True,
+    "slideshow_missed_rate": True,
+}
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def thread_count():
+    # Linux 上从 /proc 读取，包含 Qt 自己创建的线程
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return threading.active_count()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class Session:
+    def __init__(self, app, viewer_module, args):
+        self.app = app
+        self.args = args
+        self.viewer = viewer_module.acyViewer()
+        self.viewer.resize(1000, 760)
+        self.peak_threads = thread_count()
+
+    def pump(self, seconds):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            self.app.processEvents()
+            self.peak_threads = max(self.peak_threads, thread_count())
+            time.sleep(0.001)
+
+    def shown_key(self):
+        pixmap = self.viewer.image_label.pixmap()
+        return pixmap.cacheKey() if pixmap is not None and not pixmap.isNull() else None
+
+    def wait_for_new_image(self, old_key, timeout):
+        start = time.perf_counter()
+        while time.perf_counter() - start < timeout:
+            key = self.shown_key()
+            if key is not None and key != old_key:
+                return (time.perf_counter() - start) * 1000
+            self.app.processEvents()
+            self.peak_threads = max(self.peak_threads, thread_count())
+            time.sleep(0.0005)
+        return None
+
+    def navigate(self, action):
+        # 从按键到新图片显示在界面上的时间
+        old_key = self.shown_key()
+        start = time.perf_counter()
+        action()
+        if self.wait_for_new_image(old_key, self.args.timeout) is None:
+            return None
+        return (time.perf_counter() - start) * 1000
+
+    def run(self):
+        args = self.args
+        viewer = self.viewer
+        start = time.perf_counter()
+        viewer.show()
+        # 首个像素可能来自边下载边显示的部分图片，首张完整图片以 current_entry 为准
+        first_pixel = first_image = None
+        while time.perf_counter() - start < args.timeout:
+            elapsed = (time.perf_counter() - start) * 1000
+            if first_pixel is None and self.shown_key() is not None:
+                first_pixel = elapsed
+            if viewer.current_entry is not None and self.shown_key() is not None:
+                first_image = elapsed
+                break
+            self.pump(0.0005)
+
+        if args.slideshow:
+            return self.run_slideshow(first_pixel, first_image)
+
+        next_times = []
+        misses = 0
+        for _ in range(args.images):
+            self.pump(args.interval)
+            if not viewer.image_cache:
+                misses += 1
+            elapsed = self.navigate(viewer.show_next_image)
+            if elapsed is not None:
+                next_times.append(elapsed)
+
+        previous_times = []
+        for _ in range(min(args.back, len(viewer.history) - 1)):
+            self.pump(args.interval)
+            elapsed = self.navigate(viewer.show_previous_image)
+            if elapsed is not None:
+                previous_times.append(elapsed)
+
+        viewer.close()
+        self.pump(0.2)
+        return {
+            "first_pixel_ms": first_pixel,
+            "first_image_ms": first_image,
+            "next_p50_ms": percentile(next_times, 50),
+            "next_p95_ms": percentile(next_times, 95),
+            "next_mean_ms": statistics.mean(next_times) if next_times else None,
+            "previous_p50_ms": percentile(previous_times, 50),
+            "previous_p95_ms": percentile(previous_times, 95),
+            "cache_miss_rate": misses / args.images if args.images else 0.0,
+            "navigations": len(next_times),
+            "timeouts": args.images - len(next_times),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "peak_threads": self.peak_threads,
+        }
+
+
+    def run_slideshow(self, first_pixel, first_image):
+        # 由 acyViewer 自己的幻灯片计时器翻页，放映 --images 张后统计截止时间
+        viewer = self.viewer
+        metrics = viewer.metrics
+        viewer.slideshow_interval = self.args.slideshow
+        viewer.slideshow_action.setChecked(True)
+        deadline = time.perf_counter() + self.args.images * self.args.slideshow + self.args.timeout
+        while metrics.deadlines < self.args.images and time.perf_counter() < deadline:
+            self.pump(0.01)
+        viewer.close()
+        self.pump(0.2)
+        lateness = [seconds * 1000 for seconds in metrics.deadline_lateness]
+        return {
+            "first_pixel_ms": first_pixel,
+            "first_image_ms": first_image,
+            "slideshow_deadlines": metrics.deadlines,
+            "slideshow_missed": metrics.deadlines_missed,
+            "slideshow_missed_rate": metrics.deadlines_missed / metrics.deadlines if metrics.deadlines else None,
+            "slideshow_late_p95_ms": percentile(lateness, 95),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "peak_threads": self.peak_threads,
+        }
+
+
+def compare(result, baseline, tolerance, slack_ms):
+    print(f"\n与基线对比（容差 {tolerance * 100:.0f}%）:")
+    regressions = []
+    for name, higher_is_worse in METRICS.items():
+        old = baseline["metrics"].get(name)
+        new = result["metrics"].get(name)
+        if old is None or new is None:
+            print(f"  {name:18s} {old!s:>10} -> {new!s:>10}")
+            continue
+        change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+        worse = change > tolerance if higher_is_worse else change < -tolerance
+        # 绝对差值很小的波动不算退化
+        if name.endswith("_ms") and abs(new - old) < slack_ms:
+            worse = False
+        if name.endswith("_rate") and abs(new - old) < 0.05:
+            worse = False
+        mark = "  退化" if worse else ""
+        print(f"  {name:18s} {old:10.2f} -> {new:10.2f} ({change * 100:+.1f}%){mark}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="acyViewer 基准测试")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+                        help="acyViewer.py 所在目录")
+    parser.add_argument("--images", type=int, default=40, help="向后浏览的图片数")
+    parser.add_argument("--back", type=int, default=15, help="随后回看的图片数")
+    parser.add_argument("--interval", type=float, default=0.25, help="两次翻页之间的间隔（秒）")
+    parser.add_argument("--timeout", type=float, default=30.0, help="等待单张图片的最长时间（秒）")
+    parser.add_argument("--size", action="append", default=None, help="图片尺寸，如 3000x2000，可重复")
+    parser.add_argument("--format", action="append", default=None, help="图片格式 jpg/png/bmp，可重复")
+    parser.add_argument("--count", type=int, default=60, help="模拟 API 中不同图片的数量")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--bandwidth", type=int, default=0, help="每个连接的带宽上限（字节/秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--cache-size", type=int, default=5, help="acyViewer 的最大缓存数量")
+    parser.add_argument("--slideshow", type=float, default=0.0,
+                        help="以该间隔（秒）放映幻灯片代替手动翻页，统计错过的截止时间")
+    parser.add_argument("--save", help="把结果保存为 JSON 基线")
+    parser.add_argument("--compare", help="与已保存的基线对比")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="判定退化的相对容差")
+    parser.add_argument("--slack-ms", type=float, default=50.0, help="耗时指标低于该绝对差值时不算退化")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    # 测试模式下磁盘存储放在 ~/.qttest 等独立目录中；设置由 isolated_settings 单独存放
+    QStandardPaths.setTestModeEnabled(True)
+    sys.path.insert(0, os.path.abspath(args.app))
+    import acyViewer
+
+    store_dir = acyViewer.default_store_dir()
+    shutil.rmtree(store_dir, ignore_errors=True)
+    settings = isolated_settings(acyViewer)
+
+    sizes = [parse_size(size) for size in (args.size or ["2400x1600"])]
+    api = FakeImageAPI(sizes, args.format or ["jpg"], args.count, args.latency, args.jitter,
+                       args.bandwidth, args.error_rate).start()
+    settings.setValue("api_url", api.url)
+    settings.setValue("max_cache_size", args.cache_size)
+    settings.sync()
+
+    metrics = Session(app, acyViewer, args).run()
+    api.stop()
+    shutil.rmtree(store_dir, ignore_errors=True)
+    settings.clear()
+
+    metrics["server_connections"] = api.connections
+    metrics["server_requests"] = api.requests
+    config = {key: value for key, value in vars(args).items() if key not in ("save", "compare", "app", "tolerance", "slack_ms")}
+    result = {
+        "config": config,
+        "platform": {"python": platform.python_version(), "system": platform.system(), "machine": platform.machine(),
+                     "cpus": os.cpu_count()},
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "metrics": metrics,
+    }
+
+    print("结果:")
+    for name, value in metrics.items():
+        print(f"  {name:18s} {value if not isinstance(value, float) else round(value, 2)}")
+
+    status = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("\n注意: 基线的测试参数与本次不同，对比结果仅供参考。")
+        if compare(result, baseline, args.tolerance, args.slack_ms):
+            status = 1
+    if args.save:
+        with open(args.save, 'w', encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\n已保存基线: {args.save}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
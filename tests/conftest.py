@@ -0,0 +1,37 @@
+# 测试共用的假时钟和带假时钟的构造函数
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from acyViewer import FetchScheduler, PrefetchController
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def make_scheduler():
+    def make(jitter=1.0, **kwargs):
+        # jitter 为 1.0 时取抖动区间的上限，退避时间等于 base * 2^n
+        clock = FakeClock()
+        return FetchScheduler(clock=clock, rng=lambda: jitter, **kwargs), clock
+    return make
+
+
+@pytest.fixture
+def make_controller():
+    # 每次调用都用一个新的时钟，同一个测试里的多个控制器互不影响
+    def make(min_depth=2, max_depth=10):
+        clock = FakeClock()
+        return PrefetchController(min_depth, max_depth, clock=clock), clock
+    return make
@@ -0,0 +1,75 @@
+# PrefetchController 不依赖 Qt 事件循环，用可控的时钟直接驱动
+from acyViewer import DEFAULT_MAX_CACHE_SIZE, SLIDESHOW_LEAD_MARGIN
+
+
+def navigate(controller, clock, interval, count):
+    for _ in range(count):
+        clock.advance(interval)
+        controller.record_navigation()
+
+
+def test_cold_start_uses_default_depth(make_controller):
+    controller, _ = make_controller()
+    assert controller.navigation_rate() is None
+    assert controller.target_depth() == DEFAULT_MAX_CACHE_SIZE
+
+
+def test_cold_start_default_is_clamped(make_controller):
+    controller, _ = make_controller(min_depth=1, max_depth=3)
+    assert controller.target_depth() == 3
+
+
+def test_fast_navigation_hits_max_depth(make_controller):
+    controller, clock = make_controller()
+    controller.record_fetch(1.0, 500000)
+    navigate(controller, clock, 0.1, 20)
+    # 每秒翻 10 张，单线程每秒只能取 1 张
+    assert controller.target_depth(workers=1) == 10
+
+
+def test_faster_navigation_prefetches_deeper(make_controller):
+    slow, slow_clock = make_controller(max_depth=20)
+    fast, fast_clock = make_controller(max_depth=20)
+    for controller in (slow, fast):
+        controller.record_fetch(0.5, 0)
+    navigate(slow, slow_clock, 5.0, 10)
+    navigate(fast, fast_clock, 0.4, 10)
+    assert slow.min_depth <= slow.target_depth(workers=4) < fast.target_depth(workers=4) < 20
+
+
+def test_bandwidth_limits_throughput(make_controller):
+    controller, clock = make_controller()
+    # 按耗时 4 个并发每秒能取 20 张，但每个连接 250 KB/s、每张 1 MB，合计每秒只有 1 张
+    controller.record_fetch(0.2, 1000000)
+    controller.bandwidth = 250000
+    navigate(controller, clock, 0.5, 10)
+    assert controller.target_depth(workers=4) == 10
+
+
+def test_idle_decays_to_min_depth(make_controller):
+    controller, clock = make_controller()
+    controller.record_fetch(1.0, 0)
+    navigate(controller, clock, 0.3, 20)
+    busy = controller.target_depth(workers=4)
+    clock.advance(300)
+    assert controller.target_depth(workers=4) == controller.min_depth < busy
+
+
+def test_slideshow_depth_covers_fetch_and_decode_lead(make_controller):
+    controller, _ = make_controller()
+    assert controller.slideshow_depth() == 0
+    controller.record_fetch(2.0, 0, decode_time=0.5)
+    controller.slideshow_interval = 1.0
+    lead = (2.0 + 0.5) * SLIDESHOW_LEAD_MARGIN
+    assert controller.slideshow_depth() == -(-lead // 1.0) + 1
+    assert controller.target_depth() == controller.slideshow_depth()
+
+
+def test_slideshow_depth_is_clamped(make_controller):
+    controller, _ = make_controller(min_depth=2, max_depth=4)
+    controller.record_fetch(10.0, 0)
+    controller.slideshow_interval = 0.5
+    assert controller.target_depth() == 4
+    controller.slideshow_interval = 600
+    assert controller.slideshow_depth() == 2
+    assert controller.target_depth() == 2
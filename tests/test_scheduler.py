@@ -0,0 +1,98 @@
+# FetchScheduler 的退避与熔断，时钟和随机数都是注入的
+import pytest
+
+from acyViewer import FetchScheduler, RETRY_POLICIES, DUPLICATE_BACKOFF_AFTER
+
+
+def fail(scheduler, clock, kind="http_503", retry_after=None):
+    # 每一轮都是在上一次失败之后发出的新请求
+    started = clock()
+    clock.advance(0.1)
+    return scheduler.record_failure(kind, started, retry_after)
+
+
+def test_closed_allows_everything(make_scheduler):
+    scheduler, _ = make_scheduler()
+    assert scheduler.allowed(5) == 5
+    assert scheduler.allowed(0) == 0
+
+
+def test_backoff_doubles_per_round(make_scheduler):
+    scheduler, clock = make_scheduler(threshold=10)
+    base, _ = RETRY_POLICIES["server"]
+    waits = []
+    for _ in range(3):
+        waits.append(fail(scheduler, clock))
+        assert scheduler.allowed(1) == 0
+        clock.advance(scheduler.wait_time())
+    assert waits == pytest.approx([base, base * 2, base * 4])
+    assert scheduler.allowed(3) == 3
+
+
+def test_jitter_stays_in_lower_half(make_scheduler):
+    scheduler, clock = make_scheduler(jitter=0.0, threshold=10)
+    base, _ = RETRY_POLICIES["timeout"]
+    assert fail(scheduler, clock, "timeout") == pytest.approx(base / 2)
+
+
+def test_concurrent_failures_count_as_one_round(make_scheduler):
+    scheduler, clock = make_scheduler()
+    started = clock()
+    clock.advance(0.1)
+    for _ in range(5):
+        scheduler.record_failure("connection", started)
+    assert scheduler.backoff_step == 1
+    assert scheduler.state == FetchScheduler.CLOSED
+
+
+def test_retry_after_is_respected(make_scheduler):
+    scheduler, clock = make_scheduler(threshold=10)
+    assert fail(scheduler, clock, "http_429", retry_after=42) == pytest.approx(42)
+
+
+def test_breaker_opens_and_probes(make_scheduler):
+    scheduler, clock = make_scheduler(threshold=3, cooldown=10, max_cooldown=40)
+    for _ in range(3):
+        clock.advance(scheduler.wait_time())
+        fail(scheduler, clock)
+    assert scheduler.state == FetchScheduler.OPEN
+    assert scheduler.wait_time() == pytest.approx(10)
+    clock.advance(10)
+    # 冷却结束后只放行一个探测请求
+    assert scheduler.allowed(4) == 1
+    assert scheduler.state == FetchScheduler.HALF_OPEN
+    assert scheduler.allowed(4) == 0
+    # 探测失败：重新熔断，冷却时间加倍
+    fail(scheduler, clock)
+    assert scheduler.state == FetchScheduler.OPEN
+    assert scheduler.wait_time() == pytest.approx(20)
+    clock.advance(20)
+    assert scheduler.allowed(1) == 1
+    scheduler.record_success()
+    assert scheduler.state == FetchScheduler.CLOSED
+    assert scheduler.allowed(4) == 4
+
+
+def test_cooldown_is_capped(make_scheduler):
+    scheduler, clock = make_scheduler(threshold=1, cooldown=10, max_cooldown=25)
+    fail(scheduler, clock)
+    for expected in (20, 25, 25):
+        clock.advance(scheduler.wait_time())
+        assert scheduler.allowed(1) == 1
+        fail(scheduler, clock)
+        assert scheduler.wait_time() == pytest.approx(expected)
+
+
+def test_duplicates_back_off_without_opening_the_breaker(make_scheduler):
+    scheduler, clock = make_scheduler()
+    base, _ = RETRY_POLICIES["duplicate"]
+    for _ in range(DUPLICATE_BACKOFF_AFTER):
+        assert scheduler.record_duplicate() == 0.0
+    assert scheduler.record_duplicate() == pytest.approx(base)
+    clock.advance(scheduler.wait_time())
+    assert scheduler.record_duplicate() == pytest.approx(base * 2)
+    assert scheduler.state == FetchScheduler.CLOSED
+    # 拿到新图片后清零
+    clock.advance(scheduler.wait_time())
+    scheduler.record_success()
+    assert scheduler.record_duplicate() == 0.0